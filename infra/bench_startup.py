@@ -0,0 +1,88 @@
+"""Cold-start benchmark for the service containers.
+
+For each service, measures:
+  - import_ms:   wall time of `import main` in a fresh interpreter
+  - health_ms:   process spawn -> first 200 from /health (port open, app importable)
+  - ready_ms:    process spawn -> first 200 from /ready (pools and caches warmed)
+
+Run from the repo root with DATABASE_URL set (without a database /ready never turns
+200 and is reported as null after --timeout):
+
+  python infra/bench_startup.py [--runs 3] [--services risk_engine,decision_engine]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = ["simulator", "risk_engine", "decision_engine", "orchestrator"]
+
+def _env(service: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([os.path.join(ROOT, "services", service), ROOT])
+    env.setdefault("DATABASE_URL", "postgresql://localhost/intraday")
+    return env
+
+def import_ms(service: str) -> float:
+    code = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], env=_env(service), capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _ok(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as r:
+            return r.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+def first_response_ms(service: str, timeout: float) -> dict:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=_env(service), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    res = {"health_ms": None, "ready_ms": None}
+    try:
+        while time.perf_counter() - t0 < timeout and proc.poll() is None:
+            if res["health_ms"] is None and _ok(f"http://127.0.0.1:{port}/health"):
+                res["health_ms"] = (time.perf_counter() - t0) * 1000
+            if res["health_ms"] is not None and _ok(f"http://127.0.0.1:{port}/ready"):
+                res["ready_ms"] = (time.perf_counter() - t0) * 1000
+                break
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return res
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--services", default=",".join(SERVICES))
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=30.0)
+    args = ap.parse_args(argv)
+
+    for service in args.services.split(","):
+        runs = [{"import_ms": import_ms(service), **first_response_ms(service, args.timeout)} for _ in range(args.runs)]
+        summary = {"service": service}
+        for k in ("import_ms", "health_ms", "ready_ms"):
+            vals = [r[k] for r in runs if r[k] is not None]
+            summary[k] = round(statistics.median(vals), 1) if vals else None
+        print(json.dumps(summary), flush=True)
+
+if __name__ == "__main__":
+    main()
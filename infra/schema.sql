@@ -26,6 +26,14 @@ CREATE TABLE IF NOT EXISTS cutoffs (
   timezone TEXT NOT NULL DEFAULT 'America/New_York'
 );
 
+-- FX rates used for entity-level consolidation: 1 unit of currency = rate units of base_currency
+CREATE TABLE IF NOT EXISTS fx_rates (
+  currency TEXT NOT NULL,
+  base_currency TEXT NOT NULL,
+  rate NUMERIC NOT NULL,
+  PRIMARY KEY (currency, base_currency)
+);
+
 -- Intraday events
 CREATE TABLE IF NOT EXISTS cash_events (
   event_id TEXT PRIMARY KEY,
@@ -48,8 +56,10 @@ CREATE TABLE IF NOT EXISTS cash_events (
 CREATE TABLE IF NOT EXISTS scenario_state (
   scenario_id TEXT PRIMARY KEY,
   as_of TIMESTAMPTZ NOT NULL,
-  tz TEXT NOT NULL DEFAULT 'America/New_York'
+  tz TEXT NOT NULL DEFAULT 'America/New_York',
+  data_version TEXT -- changes whenever the scenario's events are regenerated
 );
+ALTER TABLE scenario_state ADD COLUMN IF NOT EXISTS data_version TEXT;
 
 -- Opening balances per scenario
 CREATE TABLE IF NOT EXISTS opening_balances (
@@ -73,23 +83,40 @@ CREATE TABLE IF NOT EXISTS action_inventory_sweeps (
   cost_bps NUMERIC NOT NULL DEFAULT 0
 );
 
+-- Risk state snapshots, stored once per distinct content (sha256 of canonical JSON).
+-- Forecast curve is zlib-compressed JSON; the rest of the risk state stays in JSONB.
+CREATE TABLE IF NOT EXISTS risk_snapshots (
+  snapshot_hash TEXT PRIMARY KEY,
+  ts TIMESTAMPTZ NOT NULL,
+  scenario_id TEXT NOT NULL,
+  as_of TIMESTAMPTZ NOT NULL,
+  summary JSONB NOT NULL,
+  forecast_zlib BYTEA NOT NULL
+);
+
 -- Recommendations / approvals / audit
+-- decision_recommendations, execution_events and audit_log only grow, so they are
+-- range-partitioned by month on ts. Partitioned primary keys must include ts, and a
+-- plain rec_id can no longer be the target of a foreign key, so approvals and
+-- execution_events reference rec_id by convention (indexed below) rather than by FK.
+-- Old months are moved to Parquet by shared/app_common/retention.py.
 CREATE TABLE IF NOT EXISTS decision_recommendations (
-  rec_id TEXT PRIMARY KEY,
+  rec_id TEXT NOT NULL,
   scenario_id TEXT NOT NULL,
   ts TIMESTAMPTZ NOT NULL,
   entity_id TEXT NOT NULL REFERENCES entities(entity_id),
   currency TEXT NOT NULL,
   as_of TIMESTAMPTZ NOT NULL,
-  risk_state JSONB NOT NULL,
+  risk_snapshot_hash TEXT NOT NULL REFERENCES risk_snapshots(snapshot_hash),
   ranked_actions JSONB NOT NULL,
   explanation TEXT NOT NULL,
-  status TEXT NOT NULL DEFAULT 'PENDING_APPROVAL' -- PENDING_APPROVAL / APPROVED / REJECTED / EXPIRED
-);
+  status TEXT NOT NULL DEFAULT 'PENDING_APPROVAL', -- PENDING_APPROVAL / APPROVED / REJECTED / EXPIRED
+  PRIMARY KEY (rec_id, ts)
+) PARTITION BY RANGE (ts);
 
 CREATE TABLE IF NOT EXISTS approvals (
   approval_id TEXT PRIMARY KEY,
-  rec_id TEXT NOT NULL REFERENCES decision_recommendations(rec_id),
+  rec_id TEXT NOT NULL,
   ts TIMESTAMPTZ NOT NULL,
   decision TEXT NOT NULL, -- APPROVE / REJECT
   approver_role TEXT NOT NULL DEFAULT 'LIQUIDITY_RISK_HEAD',
@@ -97,23 +124,66 @@ CREATE TABLE IF NOT EXISTS approvals (
 );
 
 CREATE TABLE IF NOT EXISTS execution_events (
-  exec_id TEXT PRIMARY KEY,
-  rec_id TEXT NOT NULL REFERENCES decision_recommendations(rec_id),
+  exec_id TEXT NOT NULL,
+  rec_id TEXT NOT NULL,
   ts TIMESTAMPTZ NOT NULL,
   action_type TEXT NOT NULL,
   parameters JSONB NOT NULL,
-  status TEXT NOT NULL DEFAULT 'SIMULATED_EXECUTED'
-);
+  status TEXT NOT NULL DEFAULT 'SIMULATED_EXECUTED',
+  PRIMARY KEY (exec_id, ts)
+) PARTITION BY RANGE (ts);
 
 CREATE TABLE IF NOT EXISTS audit_log (
-  audit_id TEXT PRIMARY KEY,
+  audit_id TEXT NOT NULL,
   scenario_id TEXT NOT NULL,
   ts TIMESTAMPTZ NOT NULL,
   service TEXT NOT NULL,
   action TEXT NOT NULL,
-  details JSONB NOT NULL
-);
+  details JSONB NOT NULL,
+  PRIMARY KEY (audit_id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Catch-all partitions, plus the current and next two months. The retention job keeps
+-- creating months ahead so rows never land in the default partition in normal operation.
+-- Tables created before partitioning (relkind 'r') are left as they are.
+DO $$
+DECLARE
+  t TEXT;
+  m DATE;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['decision_recommendations', 'execution_events', 'audit_log'] LOOP
+    IF (SELECT relkind FROM pg_class WHERE oid = t::regclass) = 'p' THEN
+      EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', t || '_default', t);
+      FOR i IN 0..2 LOOP
+        m := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => i))::date;
+        EXECUTE format(
+          'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+          t || '_p' || to_char(m, 'YYYYMM'), t, m::text || ' 00:00:00+00',
+          (m + interval '1 month')::date::text || ' 00:00:00+00');
+      END LOOP;
+    END IF;
+  END LOOP;
+END $$;
+
+-- Upgrade path for databases created before risk_snapshots existed:
+-- old rows keep their inline risk_state, new rows reference a snapshot.
+ALTER TABLE decision_recommendations ADD COLUMN IF NOT EXISTS risk_snapshot_hash TEXT REFERENCES risk_snapshots(snapshot_hash);
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM information_schema.columns
+             WHERE table_name='decision_recommendations' AND column_name='risk_state') THEN
+    ALTER TABLE decision_recommendations ALTER COLUMN risk_state DROP NOT NULL;
+  END IF;
+END $$;
 
 -- Helpful indexes
 CREATE INDEX IF NOT EXISTS idx_cash_events_scenario_time ON cash_events(scenario_id, COALESCE(ts_actual_settle, ts_expected_settle));
 CREATE INDEX IF NOT EXISTS idx_cash_events_lookup ON cash_events(scenario_id, entity_id, currency, account_id);
+CREATE INDEX IF NOT EXISTS idx_risk_snapshots_scenario_as_of ON risk_snapshots(scenario_id, as_of);
+CREATE INDEX IF NOT EXISTS idx_risk_snapshots_ts ON risk_snapshots(ts);
+CREATE INDEX IF NOT EXISTS idx_decision_recommendations_lookup ON decision_recommendations(scenario_id, entity_id, currency, as_of);
+CREATE INDEX IF NOT EXISTS idx_decision_recommendations_rec_id ON decision_recommendations(rec_id);
+CREATE INDEX IF NOT EXISTS idx_decision_recommendations_snapshot ON decision_recommendations(risk_snapshot_hash);
+CREATE INDEX IF NOT EXISTS idx_approvals_rec_id ON approvals(rec_id);
+CREATE INDEX IF NOT EXISTS idx_execution_events_rec_id ON execution_events(rec_id);
+CREATE INDEX IF NOT EXISTS idx_audit_log_scenario_ts ON audit_log(scenario_id, ts);
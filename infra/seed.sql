@@ -34,3 +34,14 @@ VALUES
   ('SWP_EUR_1', 'A_EUR_FND', 'A_EUR_OPS', 'EUR', 120000000, 10, 1),
   ('SWP_GBP_1', 'A_GBP_FND', 'A_GBP_OPS', 'GBP',  80000000, 10, 1)
 ON CONFLICT DO NOTHING;
+
+-- FX for consolidated (entity-level) views; base currency rows are implicit 1.0
+INSERT INTO fx_rates(currency, base_currency, rate)
+VALUES
+  ('EUR', 'USD', 1.08),
+  ('GBP', 'USD', 1.27),
+  ('USD', 'EUR', 0.925926),
+  ('GBP', 'EUR', 1.175926),
+  ('USD', 'GBP', 0.787402),
+  ('EUR', 'GBP', 0.850394)
+ON CONFLICT DO NOTHING;
@@ -1,19 +1,21 @@
 from __future__ import annotations
 
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 
 from shared.app_common.utils import uid, now_utc
-from shared.app_common.db import exec_sql
+from shared.app_common.db import aexec_sql, afetch_one
+from shared.app_common.lifecycle import readiness, warm_async_pool, warmup_lifespan
 from shared.app_common.models import RecommendationResponse
+from shared.app_common.singleflight import AsyncSingleFlight
 
 from pydantic import BaseModel
 from typing import Any, Dict, Optional
 
 
-app = FastAPI(title="orchestrator-service")
+app = FastAPI(title="orchestrator-service", lifespan=warmup_lifespan(warm_async_pool))
 
 # Demo-safe CORS (for browser UI on a different Cloud Run domain)
 # If you want to lock it down later, replace "*" with your ui-service URL.
@@ -30,9 +32,14 @@ SIM_URL = os.getenv("SIM_URL", "http://simulator-service:8080")
 RISK_URL = os.getenv("RISK_URL", "http://risk-engine-service:8080")
 DEC_URL  = os.getenv("DEC_URL",  "http://decision-engine-service:8080")
 
-def _audit(scenario_id: str, service: str, action: str, details: dict):
+# Dashboards, the UI auto-agent and schedulers firing run_cycle for the same
+# (scenario, entity, currency, as_of, data_version) share one cycle and one
+# recommendation row.
+_cycle_flight = AsyncSingleFlight("run_cycle")
+
+async def _audit(scenario_id: str, service: str, action: str, details: dict):
     # Store as JSONB safely (minimal risk of quote issues)
-    exec_sql(
+    await aexec_sql(
         """
         INSERT INTO audit_log(audit_id, scenario_id, ts, service, action, details)
         VALUES (%(id)s, %(s)s, %(ts)s, %(svc)s, %(act)s, %(d)s::jsonb)
@@ -52,10 +59,29 @@ def _audit(scenario_id: str, service: str, action: str, details: dict):
 def health():
     return {"ok": True}
 
+@app.get("/ready")
+def ready(response: Response):
+    state = readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+@app.get("/metrics/singleflight")
+def singleflight_metrics():
+    return _cycle_flight.stats()
+
 @app.post("/run_cycle", response_model=RecommendationResponse)
 async def run_cycle(scenario_id: str, entity_id: str = "E1", currency: str = "USD"):
+    row = await afetch_one("SELECT as_of, data_version FROM scenario_state WHERE scenario_id=%(s)s", {"s": scenario_id})
+    state = (row["as_of"], row["data_version"]) if row else (None, None)
+    return await _cycle_flight.do(
+        (scenario_id, entity_id, currency, *state),
+        lambda: _run_cycle(scenario_id, entity_id, currency),
+    )
+
+async def _run_cycle(scenario_id: str, entity_id: str, currency: str):
     async with httpx.AsyncClient(timeout=30.0) as client:
-        _audit(scenario_id, "orchestrator", "ASSESS_START", {"currency": currency, "entity_id": entity_id})
+        await _audit(scenario_id, "orchestrator", "ASSESS_START", {"currency": currency, "entity_id": entity_id})
 
         # 1) Pull risk state
         risk_resp = await client.get(
@@ -65,7 +91,7 @@ async def run_cycle(scenario_id: str, entity_id: str = "E1", currency: str = "US
         risk_resp.raise_for_status()
         risk = risk_resp.json()
 
-        _audit(
+        await _audit(
             scenario_id,
             "orchestrator",
             "RISK_STATE",
@@ -90,7 +116,7 @@ async def run_cycle(scenario_id: str, entity_id: str = "E1", currency: str = "US
                 "ranked_actions": [],
                 "explanation": "No early-warning breach projected in forecast horizon. No action recommended.",
             }
-            _audit(scenario_id, "orchestrator", "NO_ACTION", rec)
+            await _audit(scenario_id, "orchestrator", "NO_ACTION", rec)
             return rec
 
         # 3) Request recommendations from decision engine
@@ -101,7 +127,7 @@ async def run_cycle(scenario_id: str, entity_id: str = "E1", currency: str = "US
         dec_resp.raise_for_status()
         rec = dec_resp.json()
 
-        _audit(
+        await _audit(
             scenario_id,
             "orchestrator",
             "RECOMMEND",
@@ -119,7 +145,7 @@ class ApprovalRequest(BaseModel):
 @app.post("/actions/approve")
 async def approve_action(req: ApprovalRequest):
     approval_id = uid("APR")
-    exec_sql(
+    await aexec_sql(
         """
         INSERT INTO action_approvals(approval_id, scenario_id, ts, entity_id, currency, decision, action)
         VALUES (%(id)s, %(s)s, %(ts)s, %(e)s, %(c)s, %(d)s, %(a)s::jsonb)
@@ -135,6 +161,6 @@ async def approve_action(req: ApprovalRequest):
         },
     )
 
-    _audit(req.scenario_id, "orchestrator", "ACTION_"+req.decision, {"approval_id": approval_id, "action": req.action})
+    await _audit(req.scenario_id, "orchestrator", "ACTION_"+req.decision, {"approval_id": approval_id, "action": req.action})
     return {"ok": True, "approval_id": approval_id}
 
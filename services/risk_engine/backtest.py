@@ -0,0 +1,340 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+
+from shared.app_common import refdata
+from shared.app_common.db import fetch_all
+from shared.app_common.decisioning import rank_actions
+from shared.app_common.scenarios import CURRENCIES, generate_events, generate_opening_balances, scenario_mode
+
+# Offline backtest: load a scenario's events once and compute the balance, forecast and
+# minutes-to-breach for every as_of at minute resolution in one vectorized pass.
+#
+# Replays the same rules as /risk_state + /scenario/step:
+#   - FAILED events never count.
+#   - RELEASED/SETTLED events settle at ts_actual_settle.
+#   - QUEUED NORMAL outflows are released by the simulator once as_of reaches
+#     ts_expected_settle and settle at COALESCE(actual, expected) after that.
+#   - Other QUEUED events never settle but stay in the forecast until their time passes.
+# The forecast at as_of t buckets pending events into STEP_MINUTES steps exactly like
+# _forecast_curve (events less than one step ahead are not applied).
+
+FORECAST_MINUTES = 180
+STEP_MINUTES = 5
+N_STEPS = FORECAST_MINUTES // STEP_MINUTES
+DRIVER_MINUTES = 120
+BACKTEST_DIR = os.getenv("BACKTEST_DIR", "/tmp/backtests")
+
+def slug(scenario_id: str) -> str:
+    # Filesystem-safe, collision-resistant name for a scenario id (ids come from callers).
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", scenario_id)[:64]
+    return f"{safe}-{hashlib.sha1(scenario_id.encode('utf-8')).hexdigest()[:8]}"
+
+def results_path(scenario_id: str, out_dir: str = BACKTEST_DIR) -> str:
+    root = os.path.realpath(out_dir)
+    path = os.path.realpath(os.path.join(root, f"{slug(scenario_id)}.npz"))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"results path for {scenario_id!r} is outside {out_dir}")
+    return path
+
+def _event_columns(rows: List[Dict[str, Any]], origin: datetime, pairs: List[tuple[str, str]]) -> Dict[str, np.ndarray]:
+    pair_idx = {p: i for i, p in enumerate(pairs)}
+    rows = [r for r in rows if r["status"] != "FAILED" and (r["entity_id"], r["currency"]) in pair_idx]
+    t0 = origin.timestamp()
+    expected = np.array([r["ts_expected"].timestamp() - t0 for r in rows], dtype=np.float64)
+    actual = np.array([r["ts_actual"].timestamp() - t0 if r["ts_actual"] else np.nan for r in rows], dtype=np.float64)
+    status = np.array([r["status"] for r in rows], dtype="U8")
+    priority = np.array([r["priority"] for r in rows], dtype="U8")
+    direction = np.array([r["direction"] for r in rows], dtype="U3")
+    amount = np.array([float(r["amount"]) for r in rows], dtype=np.float64)
+
+    eff = np.where(np.isnan(actual), expected, actual)
+    released_later = (status == "QUEUED") & (priority == "NORMAL") & (direction == "OUT")
+    settle = np.full(len(rows), np.inf)
+    settle = np.where(np.isin(status, ["RELEASED", "SETTLED"]) & ~np.isnan(actual), actual, settle)
+    settle = np.where(released_later, np.maximum(expected, eff), settle)
+
+    return {
+        "pair": np.array([pair_idx[(r["entity_id"], r["currency"])] for r in rows], dtype=np.int32),
+        "eff_s": eff,
+        "settle_s": settle,
+        "signed": np.where(direction == "IN", amount, -amount),
+        "amount": amount,
+        "direction": direction,
+        "status": status,
+        "priority": priority,
+        "rail": np.array([r["rail"] for r in rows], dtype="U8"),
+        "event_id": np.array([r["event_id"] for r in rows], dtype="U24"),
+    }
+
+def load_reference_data() -> Dict[str, Any]:
+    return {
+        "accounts": fetch_all("SELECT account_id, entity_id, currency, account_type FROM accounts ORDER BY account_id"),
+        "ew": refdata.early_warning_buffers(),
+        "sweeps": refdata.sweeps(),
+        "cutoffs": refdata.cutoffs(),
+    }
+
+def _scenario(scenario_id: str, origin: datetime, opening: Dict[tuple[str, str], float],
+              rows: List[Dict[str, Any]], ref: Dict[str, Any]) -> Dict[str, Any]:
+    pairs = sorted(p for p in opening if p in ref["ew"])
+    return {
+        "scenario_id": scenario_id,
+        "origin": origin,
+        "pairs": pairs,
+        "opening": np.array([opening[p] for p in pairs], dtype=np.float64),
+        "ew": np.array([ref["ew"][p] for p in pairs], dtype=np.float64),
+        "events": _event_columns(rows, origin, pairs),
+    }
+
+def load_scenario(scenario_id: str, ref: Dict[str, Any]) -> Dict[str, Any]:
+    ob = fetch_all("""
+      SELECT entity_id, currency, MIN(ts_open) AS ts_open, SUM(opening_balance) AS ob
+      FROM opening_balances
+      WHERE scenario_id=%(s)s
+      GROUP BY entity_id, currency
+    """, {"s": scenario_id})
+    if not ob:
+        raise ValueError("scenario not found")
+    rows = fetch_all("""
+      SELECT event_id, entity_id, currency, direction, amount, status, priority, rail,
+             ts_expected_settle AS ts_expected, ts_actual_settle AS ts_actual
+      FROM cash_events
+      WHERE scenario_id=%(s)s
+    """, {"s": scenario_id})
+    opening = {(r["entity_id"], r["currency"]): float(r["ob"]) for r in ob}
+    return _scenario(scenario_id, min(r["ts_open"] for r in ob), opening, rows, ref)
+
+def synthesize_scenario(scenario_id: str, seed: int, ts_open: datetime, ref: Dict[str, Any]) -> Dict[str, Any]:
+    # Same draws as /scenario/start, without touching the database.
+    rng = np.random.default_rng(seed)
+    entity_id = "E1"
+    opening: Dict[tuple[str, str], float] = {}
+    for a in generate_opening_balances(ref["accounts"], rng):
+        key = (a["entity_id"], a["currency"])
+        opening[key] = opening.get(key, 0.0) + a["opening"]
+    mode = scenario_mode(scenario_id)
+    rows = []
+    for ccy in CURRENCIES:
+        ops = next(a["account_id"] for a in ref["accounts"]
+                   if a["entity_id"] == entity_id and a["currency"] == ccy and a["account_type"] == "OPERATING")
+        rows.extend(generate_events(entity_id, ccy, ops, ts_open, rng, mode))
+    return _scenario(scenario_id, ts_open, opening, rows, ref)
+
+def _default_minutes(sc: Dict[str, Any]) -> int:
+    eff = sc["events"]["eff_s"]
+    return int(np.ceil(eff.max() / 60.0)) + 1 if len(eff) else 1
+
+def timeline(sc: Dict[str, Any], minutes: int | None = None) -> Dict[str, np.ndarray]:
+    # Returns balance (pairs x T), forecast (pairs x T x N_STEPS+1) and mtb (pairs x T, -1 = no breach).
+    minutes = minutes or _default_minutes(sc)
+    grid = np.arange(minutes, dtype=np.float64) * 60.0
+    ev = sc["events"]
+    n_pairs = len(sc["pairs"])
+    balance = np.empty((n_pairs, minutes))
+    forecast = np.empty((n_pairs, minutes, N_STEPS + 1))
+
+    # Upper (exclusive) edges of the cumulative forecast windows, relative to as_of.
+    edges = (np.arange(1, N_STEPS + 1) * STEP_MINUTES + STEP_MINUTES) * 60.0
+    for p in range(n_pairs):
+        m = ev["pair"] == p
+        signed = ev["signed"][m]
+
+        order = np.argsort(ev["settle_s"][m], kind="stable")
+        settle_sorted = ev["settle_s"][m][order]
+        settled_cum = np.concatenate([[0.0], np.cumsum(signed[order])])
+        balance[p] = sc["opening"][p] + settled_cum[np.searchsorted(settle_sorted, grid, side="right")]
+
+        order = np.argsort(ev["eff_s"][m], kind="stable")
+        eff_sorted = ev["eff_s"][m][order]
+        eff_cum = np.concatenate([[0.0], np.cumsum(signed[order])])
+        lo = eff_cum[np.searchsorted(eff_sorted, grid + STEP_MINUTES * 60.0, side="left")]
+        hi = eff_cum[np.searchsorted(eff_sorted, grid[:, None] + edges[None, :-1], side="left")]
+        last = eff_cum[np.searchsorted(eff_sorted, grid + FORECAST_MINUTES * 60.0, side="right")]
+        forecast[p, :, 0] = balance[p]
+        forecast[p, :, 1:-1] = balance[p][:, None] + hi - lo[:, None]
+        forecast[p, :, -1] = balance[p] + last - lo
+
+    below = forecast < sc["ew"][:, None, None]
+    mtb = np.where(below.any(axis=2), below.argmax(axis=2) * STEP_MINUTES, -1).astype(np.int16)
+    return {"as_of_s": grid, "balance": balance, "forecast": forecast, "mtb": mtb}
+
+def forecast_at(sc: Dict[str, Any], t: float) -> tuple[np.ndarray, np.ndarray]:
+    # Balance (pairs) and forecast matrix (pairs x N_STEPS+1) for every pair at one as_of,
+    # t seconds after origin, in a single pass over the event columns.
+    ev = sc["events"]
+    n_pairs = len(sc["pairs"])
+    settled = ev["settle_s"] <= t
+    balance = sc["opening"] + np.bincount(ev["pair"][settled], weights=ev["signed"][settled], minlength=n_pairs)
+
+    ahead = ev["eff_s"] - t
+    pending = (ahead >= STEP_MINUTES * 60.0) & (ahead <= FORECAST_MINUTES * 60.0)
+    step = (ahead[pending] // 60.0).astype(np.int64) // STEP_MINUTES
+    inc = np.zeros((n_pairs, N_STEPS + 1))
+    np.add.at(inc, (ev["pair"][pending], step), ev["signed"][pending])
+    return balance, balance[:, None] + np.cumsum(inc, axis=1)
+
+def _first_breach(curves: np.ndarray, threshold: np.ndarray) -> np.ndarray:
+    below = curves < threshold[:, None]
+    return np.where(below.any(axis=1), below.argmax(axis=1) * STEP_MINUTES, -1)
+
+def consolidate(sc: Dict[str, Any], t: float, rates: Dict[str, float]) -> Dict[str, Any]:
+    # Entity-level curves in a base currency: W (entities x pairs) holds each pair's FX
+    # rate in its entity's row, so one matmul converts and sums every currency.
+    missing = sorted({c for _, c in sc["pairs"]} - set(rates))
+    if missing:
+        raise ValueError(f"no FX rate for {', '.join(missing)}")
+    balance, forecast = forecast_at(sc, t)
+    entities = sorted({e for e, _ in sc["pairs"]})
+    row = {e: i for i, e in enumerate(entities)}
+    w = np.zeros((len(entities), len(sc["pairs"])))
+    for p, (e, c) in enumerate(sc["pairs"]):
+        w[row[e], p] = rates[c]
+    return {
+        "entities": entities,
+        "weights": w,
+        "balance": w @ balance,
+        "forecast": w @ forecast,
+        "ew": w @ sc["ew"],
+        "mtb": _first_breach(w @ forecast, w @ sc["ew"]),
+        "pair_balance": balance,
+        "pair_mtb": _first_breach(forecast, sc["ew"]),
+    }
+
+def _risk_dict(sc: Dict[str, Any], tl: Dict[str, np.ndarray], p: int, i: int) -> Dict[str, Any]:
+    # Rebuild the /risk_state payload at one (pair, as_of) for the decision ranking.
+    ev = sc["events"]
+    t = tl["as_of_s"][i]
+    as_of = sc["origin"] + timedelta(seconds=float(t))
+    entity_id, currency = sc["pairs"][p]
+    m = np.flatnonzero((ev["pair"] == p) & (ev["eff_s"] > t) & (ev["eff_s"] <= t + DRIVER_MINUTES * 60.0))
+    m = m[np.argsort(-ev["amount"][m], kind="stable")][:8]
+    drivers = [{
+        "event_id": str(ev["event_id"][j]),
+        "ts": (sc["origin"] + timedelta(seconds=float(ev["eff_s"][j]))).isoformat(),
+        "direction": str(ev["direction"][j]),
+        "amount": float(ev["amount"][j]),
+        "status": "QUEUED" if ev["status"][j] == "QUEUED" and ev["settle_s"][j] > t else "RELEASED",
+        "priority": str(ev["priority"][j]),
+        "rail": str(ev["rail"][j]),
+    } for j in m]
+    mtb = int(tl["mtb"][p, i])
+    return {
+        "scenario_id": sc["scenario_id"],
+        "as_of": as_of.isoformat(),
+        "entity_id": entity_id,
+        "currency": currency,
+        "current_balance": float(tl["balance"][p, i]),
+        "early_warning_buffer": float(sc["ew"][p]),
+        "buffer_remaining": float(tl["balance"][p, i] - sc["ew"][p]),
+        "minutes_to_breach": None if mtb < 0 else mtb,
+        "forecast": [{"t": (as_of + timedelta(minutes=k * STEP_MINUTES)).isoformat(), "balance": float(b)}
+                     for k, b in enumerate(tl["forecast"][p, i])],
+        "drivers": drivers,
+    }
+
+def breach_points(tl: Dict[str, np.ndarray]) -> List[tuple[int, int]]:
+    # (pair, minute index) where a breach first becomes projected after a clear stretch.
+    breach = tl["mtb"] >= 0
+    onset = breach & ~np.concatenate([np.zeros((breach.shape[0], 1), dtype=bool), breach[:, :-1]], axis=1)
+    return [(int(p), int(i)) for p, i in zip(*np.nonzero(onset))]
+
+def rank_breaches(sc: Dict[str, Any], tl: Dict[str, np.ndarray], ref: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for p, i in breach_points(tl):
+        risk = _risk_dict(sc, tl, p, i)
+        sweeps = [s for s in ref["sweeps"] if s["currency"] == risk["currency"]]
+        out.append({
+            "entity_id": risk["entity_id"],
+            "currency": risk["currency"],
+            "as_of": risk["as_of"],
+            "minutes_to_breach": risk["minutes_to_breach"],
+            "ranked_actions": rank_actions(risk, risk["currency"], sweeps, ref["cutoffs"]),
+        })
+    return out
+
+def summarize(sc: Dict[str, Any], tl: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    out = []
+    for p, (entity_id, currency) in enumerate(sc["pairs"]):
+        breach = np.flatnonzero(tl["mtb"][p] >= 0)
+        out.append({
+            "entity_id": entity_id,
+            "currency": currency,
+            "breach_minutes": int(len(breach)),
+            "first_breach_as_of": (sc["origin"] + timedelta(minutes=int(breach[0]))).isoformat() if len(breach) else None,
+            "min_minutes_to_breach": int(tl["mtb"][p][breach].min()) if len(breach) else None,
+            "min_balance": float(tl["balance"][p].min()),
+        })
+    return out
+
+def write_results(path: str, sc: Dict[str, Any], tl: Dict[str, np.ndarray],
+                  rankings: List[Dict[str, Any]] | None = None, with_forecast: bool = False) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    meta = {
+        "scenario_id": sc["scenario_id"],
+        "origin": sc["origin"].isoformat(),
+        "step_minutes": 1,
+        "forecast_step_minutes": STEP_MINUTES,
+        "pairs": [list(p) for p in sc["pairs"]],
+        "summary": summarize(sc, tl),
+        "rankings": rankings,
+    }
+    arrays = {"balance": tl["balance"].astype(np.float32), "mtb": tl["mtb"]}
+    if with_forecast:
+        arrays["forecast"] = tl["forecast"].astype(np.float32)
+    np.savez_compressed(path, meta=np.array(json.dumps(meta, default=str)), **arrays)
+    return path
+
+def run(sc: Dict[str, Any], ref: Dict[str, Any], rank: bool = False, out: str | None = None,
+        with_forecast: bool = False, with_timeline: bool = False) -> Dict[str, Any]:
+    tl = timeline(sc)
+    rankings = rank_breaches(sc, tl, ref) if rank else None
+    result = {"scenario_id": sc["scenario_id"], "as_of_start": sc["origin"].isoformat(), "step_minutes": 1,
+              "minutes": int(tl["mtb"].shape[1]), "summary": summarize(sc, tl), "rankings": rankings}
+    if with_timeline:
+        result["timeline"] = [{
+            "entity_id": entity_id,
+            "currency": currency,
+            "balance": tl["balance"][p].tolist(),
+            "minutes_to_breach": [None if m < 0 else int(m) for m in tl["mtb"][p]],
+        } for p, (entity_id, currency) in enumerate(sc["pairs"])]
+    if out:
+        result["results_file"] = write_results(out, sc, tl, rankings, with_forecast)
+    return result
+
+def main(argv: List[str] | None = None):
+    ap = argparse.ArgumentParser(description="Offline minute-resolution backtest of minutes-to-breach.")
+    ap.add_argument("--scenario-id", action="append", default=[], help="replay a scenario already in the DB")
+    ap.add_argument("--seeds", default="", help="synthesize scenarios for these seeds, e.g. 1-200 or 1,5,9")
+    ap.add_argument("--modes", default="BASELINE,DELAYED_INFLOWS,UNEXPECTED_OUTFLOW,QUEUE_BUILDUP,FAIL_INFLOW")
+    ap.add_argument("--date", default=None, help="scenario day (YYYY-MM-DD, UTC) for synthesized runs")
+    ap.add_argument("--rank", action="store_true", help="run the decision ranking at each breach onset")
+    ap.add_argument("--forecast", action="store_true", help="include the full forecast tensor in result files")
+    ap.add_argument("--out", default=BACKTEST_DIR)
+    args = ap.parse_args(argv)
+
+    ref = load_reference_data()
+    runs = [(sid, None) for sid in args.scenario_id]
+    if args.seeds:
+        seeds: List[int] = []
+        for part in args.seeds.split(","):
+            lo, _, hi = part.partition("-")
+            seeds.extend(range(int(lo), int(hi or lo) + 1))
+        runs.extend((f"BT_{mode}_{seed}", seed) for mode in args.modes.split(",") for seed in seeds)
+
+    day = datetime.fromisoformat(args.date).replace(tzinfo=timezone.utc) if args.date else datetime.now(timezone.utc)
+    ts_open = day.replace(hour=7, minute=0, second=0, microsecond=0)
+    for sid, seed in runs:
+        sc = load_scenario(sid, ref) if seed is None else synthesize_scenario(sid, seed, ts_open, ref)
+        res = run(sc, ref, rank=args.rank, out=os.path.join(args.out, f"{sid}.npz"), with_forecast=args.forecast)
+        print(json.dumps({"scenario_id": sid, "seed": seed, "summary": res["summary"]}, default=str), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 from __future__ import annotations
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Response
 from datetime import datetime, timedelta, timezone
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, List, Any
-import numpy as np
 
 from shared.app_common.db import fetch_one, fetch_all
-from shared.app_common.models import RiskStateResponse
+from shared.app_common.models import ConsolidatedStateResponse, RiskStateResponse
+from shared.app_common import refdata
+from shared.app_common.lifecycle import readiness, warm_import, warm_sync_pool, warmup_lifespan
+from shared.app_common.singleflight import SingleFlight
 
-app = FastAPI(title="risk-engine-service")
+# numpy (via backtest/scenario_store) is imported lazily and pre-imported by the warm-up instead of at startup.
+app = FastAPI(title="risk-engine-service", lifespan=warmup_lifespan(
+    warm_sync_pool, refdata.warm("early_warning_limits"), warm_import("scenario_store"),
+))
 
 
 
@@ -24,11 +29,18 @@ app.add_middleware(
 FORECAST_MINUTES = 180
 STEP_MINUTES = 5
 
-def _get_as_of(scenario_id: str) -> datetime:
-    row = fetch_one("SELECT as_of FROM scenario_state WHERE scenario_id=%(s)s", {"s": scenario_id})
+# Identical concurrent /risk_state calls (same scenario, entity, currency, as_of and
+# data_version) share one computation.
+_risk_flight = SingleFlight("risk_state")
+
+def _scenario_state(scenario_id: str) -> Dict[str, Any]:
+    row = fetch_one("SELECT as_of, data_version FROM scenario_state WHERE scenario_id=%(s)s", {"s": scenario_id})
     if not row:
         raise ValueError("scenario not started")
-    return row["as_of"]
+    return row
+
+def _get_as_of(scenario_id: str) -> datetime:
+    return _scenario_state(scenario_id)["as_of"]
 
 def _opening_balance(scenario_id: str, entity_id: str, currency: str) -> float:
     row = fetch_one("""
@@ -67,12 +79,7 @@ def _mark_settled(scenario_id: str, as_of: datetime):
     """, {"s": scenario_id, "as_of": as_of})
 
 def _early_warning_buffer(entity_id: str, currency: str) -> float:
-    row = fetch_one("""
-      SELECT early_warning_buffer
-      FROM early_warning_limits
-      WHERE entity_id=%(e)s AND currency=%(c)s
-    """, {"e": entity_id, "c": currency})
-    return float(row["early_warning_buffer"])
+    return refdata.early_warning_buffers()[(entity_id, currency)]
 
 def _future_events(scenario_id: str, entity_id: str, currency: str, as_of: datetime) -> List[Dict[str, Any]]:
     # Consider:
@@ -143,13 +150,31 @@ def _drivers(scenario_id: str, entity_id: str, currency: str, as_of: datetime) -
 def health():
     return {"ok": True}
 
+@app.get("/ready")
+def ready(response: Response):
+    state = readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+@app.get("/metrics/singleflight")
+def singleflight_metrics():
+    return _risk_flight.stats()
+
 @app.get("/risk_state", response_model=RiskStateResponse)
 def risk_state(
     scenario_id: str = Query(...),
     entity_id: str = Query("E1"),
     currency: str = Query(..., description="USD/EUR/GBP")
 ):
-    as_of = _get_as_of(scenario_id)
+    state = _scenario_state(scenario_id)
+    as_of = state["as_of"]
+    return _risk_flight.do(
+        (scenario_id, entity_id, currency, as_of, state["data_version"]),
+        lambda: _compute_risk_state(scenario_id, entity_id, currency, as_of),
+    )
+
+def _compute_risk_state(scenario_id: str, entity_id: str, currency: str, as_of: datetime) -> RiskStateResponse:
     _mark_settled(scenario_id, as_of)
 
     ob = _opening_balance(scenario_id, entity_id, currency)
@@ -175,3 +200,71 @@ def risk_state(
         forecast=series,
         drivers=_drivers(scenario_id, entity_id, currency, as_of)
     )
+
+@app.get("/consolidated_state", response_model=ConsolidatedStateResponse)
+def consolidated_state(
+    scenario_id: str = Query(...),
+    base_currency: str = Query("USD", description="currency to consolidate into, using the fx_rates table"),
+    entity_id: str | None = Query(None, description="limit to one entity; default all"),
+):
+    import backtest
+    import scenario_store
+    try:
+        as_of = _get_as_of(scenario_id)
+        sc = scenario_store.get_scenario(scenario_id)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    rates = refdata.fx_rates(base_currency)
+    missing = sorted({ccy for _, ccy in sc["pairs"]} - set(rates))
+    if missing:
+        raise HTTPException(400, f"no FX rate into {base_currency} for {', '.join(missing)}")
+    c = backtest.consolidate(sc, (as_of - sc["origin"]).total_seconds(), rates)
+
+    times = [(as_of + timedelta(minutes=k * STEP_MINUTES)).isoformat() for k in range(c["forecast"].shape[1])]
+    entities = []
+    for i, e in enumerate(c["entities"]):
+        if entity_id is not None and e != entity_id:
+            continue
+        mtb = int(c["mtb"][i])
+        entities.append({
+            "entity_id": e,
+            "current_balance": float(c["balance"][i]),
+            "early_warning_buffer": float(c["ew"][i]),
+            "buffer_remaining": float(c["balance"][i] - c["ew"][i]),
+            "minutes_to_breach": None if mtb < 0 else mtb,
+            "forecast": [{"t": t, "balance": float(b)} for t, b in zip(times, c["forecast"][i])],
+            "currencies": [{
+                "currency": ccy,
+                "fx_rate": rates[ccy],
+                "current_balance": float(c["pair_balance"][p]),
+                "minutes_to_breach": None if c["pair_mtb"][p] < 0 else int(c["pair_mtb"][p]),
+            } for p, (pe, ccy) in enumerate(sc["pairs"]) if pe == e],
+        })
+    return ConsolidatedStateResponse(
+        scenario_id=scenario_id,
+        as_of=as_of,
+        base_currency=base_currency,
+        fx_rates={ccy: rates[ccy] for _, ccy in sc["pairs"]},
+        entities=entities,
+    )
+
+@app.post("/backtest")
+def run_backtest(
+    scenario_id: str = Query(...),
+    seed: int | None = Query(None, description="synthesize the scenario from this seed instead of loading it from the DB"),
+    rank: bool = Query(False, description="run the decision ranking at each breach onset"),
+    write: bool = Query(False, description="write a compressed results file under BACKTEST_DIR"),
+):
+    import backtest
+    import scenario_store
+    ref = backtest.load_reference_data()
+    try:
+        if seed is None:
+            sc = scenario_store.get_scenario(scenario_id)
+        else:
+            ts_open = datetime.now(timezone.utc).replace(hour=7, minute=0, second=0, microsecond=0)
+            sc = backtest.synthesize_scenario(scenario_id, seed, ts_open, ref)
+        out = backtest.results_path(scenario_id) if write else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return backtest.run(sc, ref, rank=rank, out=out, with_timeline=True)
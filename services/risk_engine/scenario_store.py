@@ -0,0 +1,128 @@
+from __future__ import annotations
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict
+
+import numpy as np
+
+import backtest
+from shared.app_common import refdata
+from shared.app_common.db import fetch_one
+
+# Shared-memory scenario snapshots for multi-worker deployments (uvicorn --workers N /
+# WEB_CONCURRENCY). Each scenario's event columns are written once per data version as
+# .npy files under SNAPSHOT_DIR (tmpfs by default) and every worker maps them read-only
+# with np.load(mmap_mode="r"), so N workers share one copy in the page cache.
+#
+# The first worker to need a version takes an exclusive flock on <key>.lock, loads from
+# the DB and publishes the directory with an atomic rename; the others block on the lock
+# and then attach. Attaching holds the lock shared, so the older versions of a scenario
+# that a publish removes are never deleted under a worker that is still opening them
+# (maps already open stay valid until the workers drop them). Leftover temp directories
+# from a loader that crashed mid-publish are removed by the next publish.
+#
+# Snapshots hold scenario data only. Early-warning limits are reference data and are
+# looked up from refdata on every get_scenario, so they follow REFDATA_TTL_S like
+# /risk_state does.
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "/dev/shm/intraday-scenarios" if os.path.isdir("/dev/shm")
+                         else os.path.join(tempfile.gettempdir(), "intraday-scenarios"))
+
+# Sync handlers run in FastAPI's threadpool, so the per-process cache is shared by threads.
+_attached: Dict[tuple[str, str], Dict[str, Any]] = {}
+_attached_lock = threading.Lock()
+
+_slug = backtest.slug
+
+def data_version(scenario_id: str) -> str:
+    row = fetch_one("SELECT data_version FROM scenario_state WHERE scenario_id=%(s)s", {"s": scenario_id})
+    if not row:
+        raise ValueError("scenario not started")
+    # Scenarios started before data_version existed keep a fixed version.
+    return row["data_version"] or "legacy"
+
+def _path(scenario_id: str, version: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{_slug(scenario_id)}@{version}")
+
+def _tmp_prefix(scenario_id: str) -> str:
+    return f".tmp-{_slug(scenario_id)}-"
+
+def _publish(scenario_id: str, version: str, sc: Dict[str, Any]) -> str:
+    # Caller holds the scenario's lock exclusively.
+    for d in os.listdir(SNAPSHOT_DIR):
+        if d.startswith(_tmp_prefix(scenario_id)):
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, d), ignore_errors=True)
+    final = _path(scenario_id, version)
+    tmp = tempfile.mkdtemp(prefix=_tmp_prefix(scenario_id), dir=SNAPSHOT_DIR)
+    for name, col in sc["events"].items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(col))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({
+            "scenario_id": scenario_id,
+            "origin": sc["origin"].isoformat(),
+            "pairs": [list(p) for p in sc["pairs"]],
+            "opening": sc["opening"].tolist(),
+        }, f)
+    os.rename(tmp, final)
+    prefix = f"{_slug(scenario_id)}@"
+    for d in os.listdir(SNAPSHOT_DIR):
+        if d.startswith(prefix) and d != os.path.basename(final):
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, d), ignore_errors=True)
+    return final
+
+def _attach(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    pairs = [tuple(p) for p in meta["pairs"]]
+    events = {name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+              for name in os.listdir(path) if name.endswith(".npy")}
+    return {
+        "scenario_id": meta["scenario_id"],
+        "origin": datetime.fromisoformat(meta["origin"]),
+        "pairs": pairs,
+        "opening": np.array(meta["opening"], dtype=np.float64),
+        "events": events,
+    }
+
+def _with_limits(sc: Dict[str, Any]) -> Dict[str, Any]:
+    ew = refdata.early_warning_buffers()
+    return {**sc, "ew": np.array([ew[p] for p in sc["pairs"]], dtype=np.float64)}
+
+def _load(scenario_id: str, version: str) -> Dict[str, Any]:
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _path(scenario_id, version)
+    with open(os.path.join(SNAPSHOT_DIR, f"{_slug(scenario_id)}.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        try:
+            sc = _attach(path) if os.path.isdir(path) else None
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        if sc is None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if not os.path.isdir(path):
+                    _publish(scenario_id, version, backtest.load_scenario(scenario_id, backtest.load_reference_data()))
+                sc = _attach(path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return sc
+
+def get_scenario(scenario_id: str) -> Dict[str, Any]:
+    version = data_version(scenario_id)
+    key = (scenario_id, version)
+    with _attached_lock:
+        sc = _attached.get(key)
+    if sc is None:
+        # Attached outside the lock (file I/O); threads racing here both attach the same
+        # files and the last one is kept. The flock serializes them against publishers.
+        sc = _load(scenario_id, version)
+        with _attached_lock:
+            for k in [k for k in _attached if k[0] == scenario_id]:
+                del _attached[k]
+            _attached[key] = sc
+    return _with_limits(sc)
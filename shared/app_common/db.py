@@ -1,10 +1,75 @@
+import asyncio
+import logging
 import os
-import psycopg
+import threading
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+
+log = logging.getLogger(__name__)
+
+# Set DB_LOOP_GUARD=strict (e.g. in CI / local runs) to turn a blocking DB call
+# made from the event loop into an error instead of a warning.
+DB_LOOP_GUARD = os.getenv("DB_LOOP_GUARD", "warn")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+class BlockingDBCallError(RuntimeError):
+    pass
+
+def _check_not_in_event_loop():
+    # Sync helpers are fine from sync endpoints (FastAPI runs those in a threadpool),
+    # but from inside a running event loop they stall every other request.
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    msg = "blocking DB call from the event loop; use the afetch_*/aexec_sql helpers"
+    if DB_LOOP_GUARD == "strict":
+        raise BlockingDBCallError(msg)
+    log.warning(msg, stack_info=True)
+
+# Sync path: one pool per process so requests reuse warm connections instead of paying
+# connect + auth on every query. Opened lazily, or eagerly from the warm-up hook.
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+def open_pool(wait: bool = False) -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        # The pool is opened as soon as it is built, so a closed one here was shut down
+        # (e.g. by a timed-out wait()). psycopg_pool can't reopen it: start a fresh one.
+        if _pool is None or _pool.closed:
+            _pool = ConnectionPool(
+                os.environ["DATABASE_URL"],
+                min_size=DB_POOL_MIN,
+                max_size=DB_POOL_MAX,
+                kwargs={"row_factory": dict_row},
+                open=False,
+            )
+            _pool.open()
+        pool = _pool
+    # Wait outside the lock so close_pool() can still interrupt a slow warm-up.
+    if wait:
+        try:
+            pool.wait()
+        except PoolTimeout:
+            # wait() closes the pool on timeout; drop it so the retry builds a new one.
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+            raise
+    return pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
 
 def get_conn():
-    dsn = os.environ["DATABASE_URL"]
-    return psycopg.connect(dsn, row_factory=dict_row)
+    _check_not_in_event_loop()
+    return open_pool().connection()
 
 def fetch_one(sql: str, params=None):
     with get_conn() as conn:
@@ -23,3 +88,70 @@ def exec_sql(sql: str, params=None):
         with conn.cursor() as cur:
             cur.execute(sql, params or {})
         conn.commit()
+
+# Async path for `async def` handlers. One pool per process, opened lazily on first
+# use (or eagerly via open_async_pool from a lifespan hook).
+_async_pool: AsyncConnectionPool | None = None
+_async_pool_opened = False
+
+def _async_pool_instance() -> AsyncConnectionPool:
+    global _async_pool, _async_pool_opened
+    # Unlike the sync pool, opening is awaited, so "closed" can also mean "not opened
+    # yet" by a concurrent caller. Only a pool that was opened and then closed (e.g. by
+    # a timed-out wait()) is replaced; psycopg_pool can't reopen it.
+    if _async_pool is not None and _async_pool_opened and _async_pool.closed:
+        _async_pool = None
+    if _async_pool is None:
+        _async_pool = AsyncConnectionPool(
+            os.environ["DATABASE_URL"],
+            min_size=DB_POOL_MIN,
+            max_size=DB_POOL_MAX,
+            kwargs={"row_factory": dict_row},
+            open=False,
+        )
+        _async_pool_opened = False
+    return _async_pool
+
+async def open_async_pool(wait: bool = False) -> AsyncConnectionPool:
+    global _async_pool, _async_pool_opened
+    pool = _async_pool_instance()
+    if pool.closed:
+        await pool.open()
+        if pool is _async_pool:
+            _async_pool_opened = True
+    if wait:
+        try:
+            await pool.wait()
+        except PoolTimeout:
+            # wait() closes the pool on timeout; drop it so the retry builds a new one.
+            if _async_pool is pool:
+                _async_pool = None
+            raise
+    return pool
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+async def afetch_one(sql: str, params=None):
+    pool = await open_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params or {})
+            return await cur.fetchone()
+
+async def afetch_all(sql: str, params=None):
+    pool = await open_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params or {})
+            return await cur.fetchall()
+
+async def aexec_sql(sql: str, params=None):
+    pool = await open_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params or {})
+        await conn.commit()
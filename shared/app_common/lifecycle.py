@@ -0,0 +1,65 @@
+from __future__ import annotations
+import asyncio
+import importlib
+import inspect
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+from shared.app_common.db import close_async_pool, close_pool, open_async_pool, open_pool
+
+log = logging.getLogger(__name__)
+
+# Startup warm-up for scale-to-zero hosting. The lifespan hook starts warming in the
+# background so the port opens (and /health answers) immediately; /ready reports 200
+# only once every warmer has succeeded. Failed warm-ups are retried with backoff.
+
+WARMUP_RETRY_MAX_S = 10.0
+
+_state: Dict[str, Any] = {"ready": False, "warmup_ms": None, "attempts": 0, "error": None}
+
+def readiness() -> Dict[str, Any]:
+    return dict(_state)
+
+def warm_sync_pool():
+    open_pool(wait=True)
+
+async def warm_async_pool():
+    await open_async_pool(wait=True)
+
+def warm_import(module: str) -> Callable[[], None]:
+    # Pulls a deferred heavy import (e.g. numpy-backed modules) off the request path.
+    return lambda: importlib.import_module(module)
+
+async def _warm(warmers):
+    t0 = time.perf_counter()
+    delay = 0.5
+    while True:
+        _state["attempts"] += 1
+        try:
+            for w in warmers:
+                if inspect.iscoroutinefunction(w):
+                    await w()
+                else:
+                    await asyncio.to_thread(w)
+        except Exception as e:
+            _state["error"] = repr(e)
+            log.warning("warm-up attempt %s failed: %r", _state["attempts"], e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_S)
+            continue
+        _state.update(ready=True, error=None, warmup_ms=round((time.perf_counter() - t0) * 1000, 1))
+        return
+
+def warmup_lifespan(*warmers: Callable[[], Any]):
+    @asynccontextmanager
+    async def lifespan(app):
+        task = asyncio.create_task(_warm(warmers))
+        try:
+            yield
+        finally:
+            task.cancel()
+            await close_async_pool()
+            await asyncio.to_thread(close_pool)
+    return lifespan
@@ -26,6 +26,13 @@ class RiskStateResponse(BaseModel):
     forecast: list[dict[str, Any]]  # [{t, balance}]
     drivers: list[dict[str, Any]]   # [{event_id, ts, dir, amt, ...}]
 
+class ConsolidatedStateResponse(BaseModel):
+    scenario_id: str
+    as_of: datetime
+    base_currency: str
+    fx_rates: dict[str, float]
+    entities: list[dict[str, Any]]  # [{entity_id, current_balance, ..., forecast, currencies}]
+
 class RecommendationRequest(BaseModel):
     scenario_id: str
     entity_id: str
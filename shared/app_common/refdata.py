@@ -0,0 +1,85 @@
+from __future__ import annotations
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from shared.app_common.db import afetch_all, fetch_all
+
+# Per-process cache of the small, rarely-changing reference tables the request paths
+# read on every call. Entries expire after REFDATA_TTL_S so seed changes still show up.
+
+REFDATA_TTL_S = float(os.getenv("REFDATA_TTL_S", "300"))
+
+_QUERIES = {
+    "early_warning_limits": "SELECT entity_id, currency, early_warning_buffer FROM early_warning_limits",
+    "cutoffs": "SELECT action_type, cutoff_time_local FROM cutoffs",
+    "sweeps": """
+      SELECT sweep_id, currency, max_amount, latency_minutes, cost_bps
+      FROM action_inventory_sweeps
+      ORDER BY max_amount DESC
+    """,
+    "fx_rates": "SELECT currency, base_currency, rate FROM fx_rates",
+}
+
+_cache: Dict[str, tuple[float, List[Dict[str, Any]]]] = {}
+
+def _hit(key: str) -> List[Dict[str, Any]] | None:
+    entry = _cache.get(key)
+    if entry and time.monotonic() - entry[0] < REFDATA_TTL_S:
+        return entry[1]
+    return None
+
+def _rows(key: str) -> List[Dict[str, Any]]:
+    rows = _hit(key)
+    if rows is None:
+        rows = fetch_all(_QUERIES[key])
+        _cache[key] = (time.monotonic(), rows)
+    return rows
+
+async def _arows(key: str) -> List[Dict[str, Any]]:
+    rows = _hit(key)
+    if rows is None:
+        rows = await afetch_all(_QUERIES[key])
+        _cache[key] = (time.monotonic(), rows)
+    return rows
+
+def clear():
+    _cache.clear()
+
+def _ew(rows):
+    return {(r["entity_id"], r["currency"]): float(r["early_warning_buffer"]) for r in rows}
+
+def _cutoffs(rows):
+    return {r["action_type"]: r["cutoff_time_local"] for r in rows}
+
+def early_warning_buffers() -> Dict[tuple[str, str], float]:
+    return _ew(_rows("early_warning_limits"))
+
+def cutoffs() -> Dict[str, str]:
+    return _cutoffs(_rows("cutoffs"))
+
+def sweeps(currency: str | None = None) -> List[Dict[str, Any]]:
+    return [s for s in _rows("sweeps") if currency is None or s["currency"] == currency]
+
+def fx_rates(base_currency: str) -> Dict[str, float]:
+    rates = {r["currency"]: float(r["rate"]) for r in _rows("fx_rates") if r["base_currency"] == base_currency}
+    rates[base_currency] = 1.0
+    return rates
+
+async def acutoffs() -> Dict[str, str]:
+    return _cutoffs(await _arows("cutoffs"))
+
+async def asweeps(currency: str | None = None) -> List[Dict[str, Any]]:
+    return [s for s in await _arows("sweeps") if currency is None or s["currency"] == currency]
+
+def warm(*keys: str) -> Callable[[], None]:
+    def _warm():
+        for k in keys:
+            _rows(k)
+    return _warm
+
+def awarm(*keys: str) -> Callable[[], Awaitable[None]]:
+    async def _warm():
+        for k in keys:
+            await _arows(k)
+    return _warm
@@ -0,0 +1,320 @@
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+from psycopg import sql
+
+from shared.app_common.db import exec_sql, fetch_all, fetch_one, get_conn
+from shared.app_common.snapshots import to_json
+from shared.app_common.utils import now_utc
+
+log = logging.getLogger(__name__)
+
+# Monthly partition maintenance and archival for the append-only tables.
+# Partitions named <table>_pYYYYMM older than RETENTION_DAYS are written to
+# ARCHIVE_DIR/<table>/<partition>.parquet (zstd) and then detached and dropped.
+# Run it on a schedule (e.g. daily):  python -m shared.app_common.retention run
+# Parquet support needs pyarrow, which is only installed where the job runs
+# (pip install -r shared/requirements-retention.txt).
+#
+# Rows whose month has no partition land in <table>_default. Before a month partition
+# is created, its rows are moved out of the default (Postgres refuses to create it
+# otherwise), so late or out-of-range rows end up in a regular month and get archived.
+
+PARTITIONED_TABLES = ["decision_recommendations", "execution_events", "audit_log"]
+# Archive file layout per table, fixed up front so every file of a table has the same
+# schema whatever the first rows look like (e.g. a month where a column is all NULL).
+# JSONB columns are stored as canonical JSON text.
+ARCHIVE_COLUMNS = {
+    "decision_recommendations": [
+        ("rec_id", "text"), ("scenario_id", "text"), ("ts", "timestamptz"), ("entity_id", "text"),
+        ("currency", "text"), ("as_of", "timestamptz"), ("risk_snapshot_hash", "text"),
+        ("ranked_actions", "json"), ("explanation", "text"), ("status", "text"),
+        ("risk_state", "json"),  # only on databases upgraded from inline risk states
+    ],
+    "execution_events": [
+        ("exec_id", "text"), ("rec_id", "text"), ("ts", "timestamptz"), ("action_type", "text"),
+        ("parameters", "json"), ("status", "text"),
+    ],
+    "audit_log": [
+        ("audit_id", "text"), ("scenario_id", "text"), ("ts", "timestamptz"), ("service", "text"),
+        ("action", "text"), ("details", "json"),
+    ],
+    "risk_snapshots": [
+        ("snapshot_hash", "text"), ("ts", "timestamptz"), ("scenario_id", "text"),
+        ("as_of", "timestamptz"), ("summary", "json"), ("forecast_zlib", "bytea"),
+    ],
+}
+JSON_COLUMNS = {t: [c for c, kind in cols if kind == "json"] for t, cols in ARCHIVE_COLUMNS.items()}
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "/var/lib/intraday/archive")
+# Rows per server-side cursor fetch and per Parquet row group; bounds the job's memory.
+ARCHIVE_BATCH_ROWS = int(os.getenv("ARCHIVE_BATCH_ROWS", "10000"))
+MONTHS_AHEAD = 2
+
+_PARTITION_RE = re.compile(r"^(?P<table>[a-z_]+)_p(?P<ym>\d{6})$")
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("archival needs pyarrow: pip install -r shared/requirements-retention.txt") from e
+    return pyarrow
+
+def _month_start(d: date, offset: int = 0) -> date:
+    m = d.year * 12 + (d.month - 1) + offset
+    return date(m // 12, m % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+def is_partitioned(table: str) -> bool:
+    # Databases created before partitioning keep plain tables, which the job skips (see
+    # the README for migrating them).
+    row = fetch_one("SELECT relkind FROM pg_class WHERE relname=%(t)s", {"t": table})
+    return bool(row) and row["relkind"] == "p"
+
+def _month_bounds(month: date) -> tuple[sql.Literal, sql.Literal]:
+    return (sql.Literal(f"{month.isoformat()} 00:00:00+00"),
+            sql.Literal(f"{_month_start(month, 1).isoformat()} 00:00:00+00"))
+
+def _exists(relname: str) -> bool:
+    return fetch_one("SELECT to_regclass(%(n)s) AS oid", {"n": relname})["oid"] is not None
+
+def _default_months(table: str) -> List[date]:
+    # Normally empty: ensure_partitions keeps months ahead of the clock.
+    if not _exists(f"{table}_default"):
+        return []
+    rows = fetch_all(sql.SQL("SELECT DISTINCT date_trunc('month', ts AT TIME ZONE 'UTC')::date AS m FROM {}").format(
+        sql.Identifier(f"{table}_default")))
+    return [r["m"] for r in rows]
+
+def create_month_partition(table: str, month: date, dry_run: bool = False) -> Dict[str, Any] | None:
+    name, default = partition_name(table, month), f"{table}_default"
+    if _exists(name):
+        return None
+    lo, hi = _month_bounds(month)
+    in_month = sql.SQL("ts >= {} AND ts < {}").format(lo, hi)
+    has_default = _exists(default)
+    with get_conn() as conn:
+        moved = conn.execute(sql.SQL("SELECT count(*) AS n FROM {} WHERE {}").format(
+            sql.Identifier(default), in_month)).fetchone()["n"] if has_default else 0
+        if dry_run:
+            return {"table": table, "partition": name, "moved_from_default": moved, "dry_run": True} if moved else None
+        if moved:
+            # One transaction: the parent stays locked from DETACH to ATTACH, so no new
+            # row can slip into the default while the month's rows are being moved.
+            conn.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(table), sql.Identifier(default)))
+        conn.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})").format(
+            sql.Identifier(name), sql.Identifier(table), lo, hi))
+        if moved:
+            conn.execute(sql.SQL("INSERT INTO {} SELECT * FROM {} WHERE {}").format(
+                sql.Identifier(name), sql.Identifier(default), in_month))
+            conn.execute(sql.SQL("DELETE FROM {} WHERE {}").format(sql.Identifier(default), in_month))
+            conn.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} DEFAULT").format(
+                sql.Identifier(table), sql.Identifier(default)))
+    if moved:
+        log.warning("moved %s rows of %s from %s into %s", moved, table, default, name)
+        return {"table": table, "partition": name, "moved_from_default": moved}
+    return None
+
+def ensure_table_partitions(table: str, now: datetime | None = None, months_ahead: int = MONTHS_AHEAD,
+                            dry_run: bool = False) -> List[Dict[str, Any]]:
+    today = (now or now_utc()).date()
+    months = {_month_start(today, i) for i in range(months_ahead + 1)} | set(_default_months(table))
+    return [r for r in (create_month_partition(table, m, dry_run) for m in sorted(months)) if r]
+
+def ensure_partitions(now: datetime | None = None, months_ahead: int = MONTHS_AHEAD) -> List[Dict[str, Any]]:
+    out = []
+    for table in filter(is_partitioned, PARTITIONED_TABLES):
+        out.extend(ensure_table_partitions(table, now, months_ahead))
+    return out
+
+def list_partitions(table: str) -> List[tuple[str, date]]:
+    rows = fetch_all("""
+      SELECT c.relname
+      FROM pg_inherits i
+      JOIN pg_class c ON c.oid = i.inhrelid
+      JOIN pg_class p ON p.oid = i.inhparent
+      WHERE p.relname = %(t)s
+    """, {"t": table})
+    out = []
+    for r in rows:
+        m = _PARTITION_RE.match(r["relname"])
+        if m and m.group("table") == table:
+            ym = m.group("ym")
+            out.append((r["relname"], date(int(ym[:4]), int(ym[4:]), 1)))
+    return sorted(out, key=lambda x: x[1])
+
+def _schema(table: str):
+    pa = _pyarrow()
+    types = {"text": pa.string(), "json": pa.string(), "timestamptz": pa.timestamp("us", tz="UTC"),
+             "bytea": pa.binary()}
+    return pa.schema([(c, types[kind]) for c, kind in ARCHIVE_COLUMNS[table]])
+
+def _to_arrow_rows(table: str, rows: List[Dict[str, Any]], schema) -> List[Dict[str, Any]]:
+    # Refuse to archive (and then drop) columns the archive layout doesn't know about.
+    unknown = set(rows[0]) - set(schema.names)
+    if unknown:
+        raise RuntimeError(f"{table}: columns {sorted(unknown)} missing from ARCHIVE_COLUMNS")
+    json_cols = JSON_COLUMNS.get(table, [])
+    return [{k: (to_json(v) if k in json_cols and v is not None else v) for k, v in r.items()} for r in rows]
+
+def _stream(conn, name: str, query, params=None) -> Iterator[List[Dict[str, Any]]]:
+    # Server-side cursor: rows come over in ARCHIVE_BATCH_ROWS chunks, never all at once.
+    with conn.cursor(name=name) as cur:
+        cur.execute(query, params or {})
+        while rows := cur.fetchmany(ARCHIVE_BATCH_ROWS):
+            yield rows
+
+def _write_parquet(table: str, name: str, batches: Iterator[List[Dict[str, Any]]]) -> tuple[int, str | None]:
+    pa = _pyarrow()
+    schema = _schema(table)
+    out_dir = os.path.join(ARCHIVE_DIR, table)
+    path = os.path.join(out_dir, f"{name}.parquet")
+    tmp = os.path.join(out_dir, f".{name}.parquet.tmp")  # dot-prefixed: ignored by dataset discovery
+    n, writer = 0, None
+    try:
+        for rows in batches:
+            if writer is None:
+                os.makedirs(out_dir, exist_ok=True)
+                writer = pa.parquet.ParquetWriter(tmp, schema, compression="zstd")
+            writer.write_table(pa.Table.from_pylist(_to_arrow_rows(table, rows, schema), schema=schema))
+            n += len(rows)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            os.remove(tmp)
+        raise
+    if writer is None:
+        return 0, None
+    writer.close()
+    # Never replace an earlier archive (a second run on the same day, or a month that
+    # was archived before and got late rows); add a suffix instead.
+    k = 1
+    while os.path.exists(path):
+        path = os.path.join(out_dir, f"{name}-{k}.parquet")
+        k += 1
+    os.replace(tmp, path)
+    return n, path
+
+def archive_partition(table: str, name: str) -> Dict[str, Any]:
+    with get_conn() as conn:
+        n, path = _write_parquet(table, name, _stream(
+            conn, f"archive_{name}", sql.SQL("SELECT * FROM {}").format(sql.Identifier(name))))
+    # Write the file before dropping anything; a crash in between leaves data in both places.
+    exec_sql(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(table), sql.Identifier(name)))
+    exec_sql(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+    return {"table": table, "partition": name, "rows": n, "file": path}
+
+def archive_orphan_snapshots(cutoff: datetime) -> Dict[str, Any]:
+    # Snapshots are shared between recommendations, so they are archived once nothing
+    # in the hot table references them any more. Each batch is deleted as it is written,
+    # in the same transaction, which only commits once the file is in place.
+    def batches(conn):
+        for rows in _stream(conn, "archive_risk_snapshots", """
+          SELECT s.*
+          FROM risk_snapshots s
+          WHERE s.ts < %(cutoff)s
+            AND NOT EXISTS (SELECT 1 FROM decision_recommendations r WHERE r.risk_snapshot_hash = s.snapshot_hash)
+        """, {"cutoff": cutoff}):
+            conn.execute("DELETE FROM risk_snapshots WHERE snapshot_hash = ANY(%(h)s)",
+                         {"h": [r["snapshot_hash"] for r in rows]})
+            yield rows
+
+    with get_conn() as conn:
+        n, path = _write_parquet("risk_snapshots", f"risk_snapshots_{cutoff:%Y%m%d}", batches(conn))
+    return {"table": "risk_snapshots", "rows": n, "file": path}
+
+def run_retention(now: datetime | None = None, retention_days: int = RETENTION_DAYS, dry_run: bool = False) -> List[Dict[str, Any]]:
+    now = now or now_utc()
+    cutoff = now - timedelta(days=retention_days)
+    out = []
+    # A failure on one table is reported and the run carries on with the others.
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            log.error("%s is not partitioned: nothing in it is archived or expired. "
+                      "Migrate it to the partitioned layout (see README).", table)
+            out.append({"table": table, "skipped": "not partitioned"})
+            continue
+        try:
+            out.extend(ensure_table_partitions(table, now, dry_run=dry_run))
+            for name, month in list_partitions(table):
+                # Only whole months that ended before the cutoff.
+                if datetime.combine(_month_start(month, 1), datetime.min.time(), timezone.utc) > cutoff:
+                    continue
+                out.append({"table": table, "partition": name, "dry_run": True} if dry_run else archive_partition(table, name))
+        except Exception as e:
+            log.exception("retention failed for %s", table)
+            out.append({"table": table, "error": repr(e)})
+    if not dry_run:
+        try:
+            out.append(archive_orphan_snapshots(cutoff))
+        except Exception as e:
+            log.exception("retention failed for risk_snapshots")
+            out.append({"table": "risk_snapshots", "error": repr(e)})
+    return out
+
+def read_archive(table: str, scenario_id: str | None = None, start: datetime | None = None,
+                 end: datetime | None = None, columns: List[str] | None = None) -> List[Dict[str, Any]]:
+    # Read archived rows back, filtered on scenario_id and a [start, end) ts range.
+    if scenario_id is not None and "scenario_id" not in dict(ARCHIVE_COLUMNS[table]):
+        raise ValueError(f"{table} has no scenario_id column")
+    pa = _pyarrow()
+    path = os.path.join(ARCHIVE_DIR, table)
+    if not os.path.isdir(path):
+        return []
+    ds = pa.dataset.dataset(path, format="parquet")
+    field = pa.dataset.field
+    flt = None
+    for cond in (
+        field("scenario_id") == scenario_id if scenario_id is not None else None,
+        field("ts") >= pa.scalar(start, pa.timestamp("us", tz="UTC")) if start is not None else None,
+        field("ts") < pa.scalar(end, pa.timestamp("us", tz="UTC")) if end is not None else None,
+    ):
+        if cond is not None:
+            flt = cond if flt is None else flt & cond
+    rows = ds.to_table(columns=columns, filter=flt).to_pylist()
+    for r in rows:
+        for c in JSON_COLUMNS.get(table, []):
+            if r.get(c) is not None:
+                r[c] = json.loads(r[c])
+    return rows
+
+def main(argv: List[str] | None = None):
+    ap = argparse.ArgumentParser(description="Partition maintenance and archival for audit/recommendation tables.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="create upcoming partitions and archive expired ones")
+    run.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    run.add_argument("--dry-run", action="store_true")
+    read = sub.add_parser("read", help="print archived rows as JSON lines")
+    read.add_argument("table", choices=list(ARCHIVE_COLUMNS))
+    read.add_argument("--scenario-id")
+    read.add_argument("--start", type=datetime.fromisoformat)
+    read.add_argument("--end", type=datetime.fromisoformat)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.cmd == "run":
+        results = run_retention(retention_days=args.retention_days, dry_run=args.dry_run)
+        for r in results:
+            print(json.dumps(r, default=str), flush=True)
+        if any("error" in r for r in results):
+            raise SystemExit(1)
+    else:
+        try:
+            rows = read_archive(args.table, args.scenario_id, args.start, args.end)
+        except ValueError as e:
+            ap.error(str(e))
+        for r in rows:
+            print(json.dumps(r, default=str), flush=True)
+
+if __name__ == "__main__":
+    main()
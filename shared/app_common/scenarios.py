@@ -0,0 +1,118 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from shared.app_common.utils import uid
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Pure scenario generation, shared by the simulator (which persists the rows) and the
+# offline backtest (which keeps them in memory). RNG draw order is part of the contract:
+# a given seed must produce the same day in both places.
+
+CURRENCIES = ["USD", "EUR", "GBP"]
+
+def scenario_mode(scenario_id: str) -> str:
+    # Pick scenario mode from scenario_id (simple mapping)
+    sid = scenario_id.upper()
+    if "DELAY" in sid:
+        return "DELAYED_INFLOWS"
+    if "OUTFLOW" in sid:
+        return "UNEXPECTED_OUTFLOW"
+    if "QUEUE" in sid:
+        return "QUEUE_BUILDUP"
+    if "FAIL" in sid:
+        return "FAIL_INFLOW"
+    return "BASELINE"
+
+def generate_opening_balances(accounts: List[Dict[str, Any]], rng: np.random.Generator) -> List[Dict[str, Any]]:
+    rows = []
+    for a in accounts:
+        # Funding accounts start higher; operating lower; adjust as needed
+        if a["account_id"].endswith("_FND"):
+            base = {"USD": 400e6, "EUR": 250e6, "GBP": 180e6}.get(a["currency"], 200e6)
+        else:
+            base = {"USD": 120e6, "EUR":  80e6, "GBP":  60e6}.get(a["currency"],  60e6)
+        opening = float(base * rng.uniform(0.85, 1.15))
+        rows.append({**a, "opening": opening})
+    return rows
+
+def _intraday_intensity(hour: int) -> float:
+    # Simple seasonality: morning wave + afternoon wave
+    if 9 <= hour <= 11:
+        return 1.6
+    if 14 <= hour <= 16:
+        return 1.8
+    if 7 <= hour <= 8:
+        return 1.2
+    return 0.8
+
+def generate_events(entity_id: str, currency: str, account_id: str, ts_open: datetime,
+                    rng: np.random.Generator, mode: str) -> List[Dict[str, Any]]:
+    import numpy as np  # deferred: keeps numpy out of service import time
+
+    # Create ~300-800 events/day total across currencies; scale by currency
+    scale = {"USD": 1.2, "EUR": 0.9, "GBP": 0.7}.get(currency, 0.8)
+    n_events = int(rng.integers(180, 340) * scale)
+
+    # Generate times across the day
+    times = []
+    for _ in range(n_events):
+        h = int(rng.integers(7, 18))
+        intensity = _intraday_intensity(h)
+        minute = int(rng.integers(0, 60))
+        # Cluster toward settlement windows by shrinking jitter when intensity high
+        jitter = int(rng.normal(0, 8 / intensity))
+        t = ts_open.replace(hour=h, minute=minute, second=0, microsecond=0) + timedelta(minutes=jitter)
+        # clamp to same day range
+        if t < ts_open.replace(hour=7, minute=0, second=0, microsecond=0):
+            t = ts_open.replace(hour=7, minute=0, second=0, microsecond=0)
+        if t > ts_open.replace(hour=18, minute=0, second=0, microsecond=0):
+            t = ts_open.replace(hour=18, minute=0, second=0, microsecond=0)
+        times.append(t)
+
+    times.sort()
+    # Amounts: heavy tail
+    amounts = rng.lognormal(mean=np.log(2.5e6), sigma=1.0, size=len(times))
+    amounts = np.clip(amounts, 25000, 75e6)  # cap extremes
+
+    events = []
+    for t, amt in zip(times, amounts):
+        direction = "IN" if rng.random() < 0.50 else "OUT"
+        rail = "WIRE" if rng.random() < 0.35 else ("ACH" if rng.random() < 0.6 else "INTERNAL")
+        priority = "CRITICAL" if rng.random() < 0.08 else "NORMAL"
+        status = "QUEUED" if (direction == "OUT" and rng.random() < 0.25) else "RELEASED"
+
+        expected = t + timedelta(minutes=int(rng.integers(5, 40)))
+        actual = expected
+
+        # Scenario perturbations
+        if mode == "DELAYED_INFLOWS" and direction == "IN" and rng.random() < 0.18:
+            actual = expected + timedelta(minutes=int(rng.integers(60, 140)))
+        if mode == "UNEXPECTED_OUTFLOW" and direction == "OUT" and rng.random() < 0.02:
+            amt = amt * rng.uniform(8, 15)
+        if mode == "QUEUE_BUILDUP" and direction == "OUT" and rng.random() < 0.45:
+            status = "QUEUED"
+            # queued items settle later once released
+            actual = None
+        if mode == "FAIL_INFLOW" and direction == "IN" and rng.random() < 0.02:
+            status = "FAILED"
+            actual = None
+
+        events.append({
+            "event_id": uid("EVT"),
+            "ts_created": t,
+            "ts_expected": expected,
+            "ts_actual": actual,
+            "entity_id": entity_id,
+            "currency": currency,
+            "account_id": account_id,
+            "direction": direction,
+            # Convert to float
+            "amount": float(amt),
+            "rail": rail,
+            "status": status,
+            "priority": priority,
+        })
+    return events
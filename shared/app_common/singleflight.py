@@ -0,0 +1,131 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# Single-flight request coalescing: concurrent calls with the same key share one
+# in-flight computation and its result (or its exception). Successful results are also
+# reused for SINGLEFLIGHT_REUSE_S after completion, so a burst of dashboards, the UI
+# auto-agent and the scheduler hitting the same tick collapses to one computation.
+# Keys must include everything the result depends on (e.g. the scenario's as_of and
+# data_version: a scenario regenerated at the same ts_open must not reuse old results).
+
+SINGLEFLIGHT_REUSE_S = float(os.getenv("SINGLEFLIGHT_REUSE_S", "2.0"))
+
+class _Stats:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+        self.reused = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "computations": self.leaders,
+            "coalesced": self.coalesced,
+            "reused": self.reused,
+            # Share of calls that did not run their own computation.
+            "coalescing_ratio": round(1 - self.leaders / self.calls, 4) if self.calls else 0.0,
+        }
+
+class _Recent:
+    def __init__(self, reuse_s: float):
+        self.reuse_s = reuse_s
+        self._done: Dict[Hashable, tuple[float, Any]] = {}
+
+    def get(self, key: Hashable):
+        hit = self._done.get(key)
+        if hit and time.monotonic() - hit[0] < self.reuse_s:
+            return True, hit[1]
+        return False, None
+
+    def put(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        for k in [k for k, (t, _) in self._done.items() if now - t >= self.reuse_s]:
+            del self._done[k]
+        if self.reuse_s > 0:
+            self._done[key] = (now, value)
+
+class SingleFlight:
+    # For sync handlers, which FastAPI runs concurrently in its threadpool.
+
+    def __init__(self, name: str, reuse_s: float = SINGLEFLIGHT_REUSE_S):
+        self._stats = _Stats(name)
+        self._recent = _Recent(reuse_s)
+        self._inflight: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._stats.calls += 1
+            hit, value = self._recent.get(key)
+            if hit:
+                self._stats.reused += 1
+                return value
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = {"done": threading.Event(), "value": None, "error": None}
+                self._stats.leaders += 1
+            else:
+                self._stats.coalesced += 1
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["value"]
+
+        try:
+            call["value"] = fn()
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call["error"] is None:
+                    self._recent.put(key, call["value"])
+            call["done"].set()
+        return call["value"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._stats.snapshot()
+
+class AsyncSingleFlight:
+    # For async handlers. The shared computation runs as its own task, so a caller that
+    # disconnects (and is cancelled) does not cancel it for the others.
+
+    def __init__(self, name: str, reuse_s: float = SINGLEFLIGHT_REUSE_S):
+        self._stats = _Stats(name)
+        self._recent = _Recent(reuse_s)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats.calls += 1
+        hit, value = self._recent.get(key)
+        if hit:
+            self._stats.reused += 1
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats.leaders += 1
+            task = self._inflight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._stats.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._recent.put(key, task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        return self._stats.snapshot()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+import hashlib
+import json
+import zlib
+from typing import Any, Dict
+
+from shared.app_common.db import aexec_sql, afetch_one
+from shared.app_common.utils import now_utc
+
+# Risk snapshots are stored once per distinct content and referenced by hash from
+# decision_recommendations. The forecast curve is the bulk of the payload, so it is
+# kept zlib-compressed in a BYTEA column; everything else stays queryable as JSONB.
+
+def to_json(obj: Any) -> str:
+    # Canonical form: stable key order and no whitespace, so equal dicts hash equally.
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+def snapshot_hash(risk: Dict[str, Any]) -> str:
+    return hashlib.sha256(to_json(risk).encode("utf-8")).hexdigest()
+
+def pack_forecast(forecast: list[dict[str, Any]]) -> bytes:
+    return zlib.compress(to_json(forecast).encode("utf-8"), 6)
+
+def unpack_forecast(blob: bytes) -> list[dict[str, Any]]:
+    return json.loads(zlib.decompress(bytes(blob)).decode("utf-8"))
+
+def _snapshot_params(risk: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {k: v for k, v in risk.items() if k != "forecast"}
+    return {
+        "h": snapshot_hash(risk),
+        "ts": now_utc(),
+        "s": risk["scenario_id"],
+        "as_of": risk["as_of"],
+        "summary": to_json(summary),
+        "forecast": pack_forecast(risk.get("forecast") or []),
+    }
+
+INSERT_SNAPSHOT_SQL = """
+  INSERT INTO risk_snapshots(snapshot_hash, ts, scenario_id, as_of, summary, forecast_zlib)
+  VALUES (%(h)s, %(ts)s, %(s)s, %(as_of)s, %(summary)s::jsonb, %(forecast)s)
+  ON CONFLICT (snapshot_hash) DO NOTHING
+"""
+
+async def astore_risk_snapshot(risk: Dict[str, Any]) -> str:
+    params = _snapshot_params(risk)
+    await aexec_sql(INSERT_SNAPSHOT_SQL, params)
+    return params["h"]
+
+async def aload_risk_snapshot(snapshot_hash: str) -> Dict[str, Any] | None:
+    row = await afetch_one("""
+      SELECT summary, forecast_zlib FROM risk_snapshots WHERE snapshot_hash=%(h)s
+    """, {"h": snapshot_hash})
+    if not row:
+        return None
+    return {**row["summary"], "forecast": unpack_forecast(row["forecast_zlib"])}
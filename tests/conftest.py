@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Services import the shared package as `shared.app_common` (PYTHONPATH=/app in the images).
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
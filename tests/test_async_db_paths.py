@@ -0,0 +1,249 @@
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from shared.app_common import db, lifecycle, refdata
+from shared.app_common.db import BlockingDBCallError
+from shared.app_common.singleflight import AsyncSingleFlight
+
+# The async handlers must never reach the sync DB helpers. These tests run them with
+# DB_LOOP_GUARD=strict against an in-memory stand-in for the psycopg AsyncConnectionPool,
+# so a blocking call made from the event loop fails the request instead of only logging.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RISK_URL = "http://risk-engine-service:8080"
+DEC_URL = "http://decision-engine-service:8080"
+
+def _load_service(name: str):
+    # Every service's module is main.py, so load each under its own name.
+    path = os.path.join(ROOT, "services", name, "main.py")
+    spec = importlib.util.spec_from_file_location(f"{name}_main", path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered first so pydantic can resolve the module's postponed annotations.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+decision_engine = _load_service("decision_engine")
+orchestrator = _load_service("orchestrator")
+
+REF_ROWS = {
+    "FROM action_inventory_sweeps": [
+        {"sweep_id": "SW1", "currency": "USD", "max_amount": 5000000, "latency_minutes": 10, "cost_bps": 2.5},
+    ],
+    "FROM cutoffs": [
+        {"action_type": "SWEEP", "cutoff_time_local": "23:59"},
+        {"action_type": "THROTTLE", "cutoff_time_local": "23:59"},
+    ],
+    "FROM scenario_state": [
+        {"as_of": "2026-01-05T09:30:00+00:00", "data_version": "DV-1"},
+    ],
+}
+
+def _risk(scenario_id: str):
+    return {
+        "scenario_id": scenario_id,
+        "entity_id": "E1",
+        "currency": "USD",
+        "as_of": "2026-01-05T09:30:00+00:00",
+        "current_balance": 900000.0,
+        "early_warning_buffer": 1000000.0,
+        "buffer_remaining": -100000.0,
+        "minutes_to_breach": 0,
+        "forecast": [
+            {"t": f"2026-01-05T{9 + m // 60:02d}:{m % 60:02d}:00+00:00", "balance": 900000.0 - 1000.0 * m}
+            for m in range(30, 120, 5)
+        ],
+    }
+
+class FakeAsyncPool:
+    # Just enough of AsyncConnectionPool for db.afetch_*/aexec_sql: at most max_size
+    # connections are handed out at once and every statement takes `latency` seconds.
+
+    def __init__(self, max_size: int = 4, latency: float = 0.0):
+        self.max_size = max_size
+        self.latency = latency
+        self.closed = False
+        self.executed: list[str] = []
+        self._slots = None
+
+    async def wait(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    @asynccontextmanager
+    async def connection(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        async with self._slots:
+            yield _FakeConn(self)
+
+class _FakeConn:
+    def __init__(self, pool: FakeAsyncPool):
+        self.pool = pool
+
+    def cursor(self):
+        return _FakeCursor(self.pool)
+
+    async def commit(self):
+        pass
+
+class _FakeCursor:
+    def __init__(self, pool: FakeAsyncPool):
+        self.pool = pool
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.pool.executed.append(sql)
+        await asyncio.sleep(self.pool.latency)
+        self.rows = next((rows for frag, rows in REF_ROWS.items() if frag in sql), [])
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return list(self.rows)
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    monkeypatch.setenv("DB_LOOP_GUARD", "strict")
+    monkeypatch.setattr(db, "DB_LOOP_GUARD", "strict")
+    pool = FakeAsyncPool()
+    monkeypatch.setattr(db, "_async_pool", pool)
+    monkeypatch.setattr(db, "_async_pool_opened", True)
+    monkeypatch.setattr(lifecycle, "_state", {"ready": False, "warmup_ms": None, "attempts": 0, "error": None})
+    refdata.clear()
+    yield pool
+    refdata.clear()
+
+@pytest.fixture
+def services(monkeypatch):
+    # Orchestrator -> decision engine runs in-process over ASGI; the risk engine is stubbed.
+    def risk_engine(request: httpx.Request):
+        assert request.url.path == "/risk_state"
+        return httpx.Response(200, json=_risk(request.url.params["scenario_id"]))
+
+    real_client = httpx.AsyncClient
+    mounts = {
+        RISK_URL: httpx.MockTransport(risk_engine),
+        DEC_URL: httpx.ASGITransport(app=decision_engine.app),
+    }
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kw: real_client(mounts=mounts, **kw))
+
+def test_strict_guard_rejects_sync_calls_on_the_loop(fake_db):
+    async def handler():
+        db.fetch_one("SELECT 1")
+    with pytest.raises(BlockingDBCallError):
+        asyncio.run(handler())
+
+def test_recommendations_uses_async_pool(fake_db, services):
+    with TestClient(decision_engine.app) as client:
+        r = client.post("/recommendations", json={"scenario_id": "SCN-REC", "entity_id": "E1", "currency": "USD"})
+    assert r.status_code == 200, r.text
+    assert r.json()["ranked_actions"]
+    assert any(s.startswith("INSERT INTO risk_snapshots") for s in fake_db.executed)
+    assert any(s.startswith("INSERT INTO decision_recommendations") for s in fake_db.executed)
+
+def test_run_cycle_uses_async_pool(fake_db, services):
+    with TestClient(orchestrator.app) as client:
+        r = client.post("/run_cycle", params={"scenario_id": "SCN-CYCLE"})
+    assert r.status_code == 200, r.text
+    assert r.json()["scenario_id"] == "SCN-CYCLE"
+    audits = [s for s in fake_db.executed if s.startswith("INSERT INTO audit_log")]
+    assert len(audits) == 3  # ASSESS_START, RISK_STATE, RECOMMEND
+    assert any(s.startswith("INSERT INTO decision_recommendations") for s in fake_db.executed)
+
+def test_run_cycle_not_reused_across_data_versions(fake_db, services, monkeypatch):
+    # A scenario regenerated at the same as_of (new data_version) must not get the
+    # previous cycle's result from the reuse window.
+    def cycle():
+        return client.post("/run_cycle", params={"scenario_id": "SCN-REGEN"}).json()["rec_id"]
+
+    with TestClient(orchestrator.app) as client:
+        first, again = cycle(), cycle()
+        monkeypatch.setitem(REF_ROWS, "FROM scenario_state", [
+            {"as_of": "2026-01-05T09:30:00+00:00", "data_version": "DV-2"},
+        ])
+        regenerated = cycle()
+    assert again == first
+    assert regenerated != first
+
+def test_approve_uses_async_pool(fake_db):
+    with TestClient(orchestrator.app) as client:
+        r = client.post("/actions/approve", json={
+            "scenario_id": "SCN-APR", "decision": "APPROVE", "action": {"action_type": "SWEEP", "amount": 1.0},
+        })
+    assert r.status_code == 200, r.text
+    assert r.json()["ok"] is True
+    assert [s.split("(")[0] for s in fake_db.executed] == ["INSERT INTO action_approvals", "INSERT INTO audit_log"]
+
+def _burst_seconds(pool_size: int, n: int, latency: float) -> float:
+    async def burst():
+        transport = httpx.ASGITransport(app=decision_engine.app)
+        async with httpx.AsyncClient(transport=transport, base_url=DEC_URL) as client:
+            await client.post("/recommendations", json={"scenario_id": "SCN-WARM", "entity_id": "E1", "currency": "USD"})
+            t0 = time.perf_counter()
+            rs = await asyncio.gather(*[
+                client.post("/recommendations", json={"scenario_id": f"SCN-BURST-{i}", "entity_id": "E1", "currency": "USD"})
+                for i in range(n)
+            ])
+            elapsed = time.perf_counter() - t0
+        assert all(r.status_code == 200 for r in rs)
+        return elapsed
+
+    db._async_pool = FakeAsyncPool(max_size=pool_size, latency=latency)
+    return asyncio.run(burst())
+
+def test_recommendation_throughput_scales_with_pool_size(fake_db, monkeypatch):
+    # Each request runs two statements (snapshot + recommendation insert) once the
+    # reference data is cached, so a burst takes about n * 2 * latency / pool_size.
+    async def risk_state(scenario_id, entity_id, currency):
+        return _risk(scenario_id)
+    monkeypatch.setattr(decision_engine, "_risk_state", risk_state)
+    n, latency = 16, 0.02
+    serial = _burst_seconds(1, n, latency)
+    pooled = _burst_seconds(8, n, latency)
+    assert serial >= n * 2 * latency
+    assert pooled < serial / 3
+
+def test_concurrent_run_cycles_share_one_computation(fake_db, services, monkeypatch):
+    # N overlapping /run_cycle calls for the same scenario tick make one recommendation.
+    monkeypatch.setattr(orchestrator, "_cycle_flight", AsyncSingleFlight("run_cycle"))
+    fake_db.latency = 0.01
+    n = 8
+
+    async def burst():
+        transport = httpx.ASGITransport(app=orchestrator.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://orchestrator-service:8080") as client:
+            rs = await asyncio.gather(*[
+                client.post("/run_cycle", params={"scenario_id": "SCN-BURST"}) for _ in range(n)
+            ])
+            stats = (await client.get("/metrics/singleflight")).json()
+        return rs, stats
+
+    rs, stats = asyncio.run(burst())
+    assert all(r.status_code == 200 for r in rs), [r.text for r in rs]
+    assert len({r.json()["rec_id"] for r in rs}) == 1
+    inserts = [s for s in fake_db.executed if s.startswith("INSERT INTO decision_recommendations")]
+    assert len(inserts) == 1
+    assert stats["calls"] == n
+    assert stats["computations"] == 1
+    assert stats["coalesced"] == n - 1
+    assert stats["coalescing_ratio"] == round(1 - 1 / n, 4)
@@ -0,0 +1,107 @@
+import os
+from datetime import date, datetime, timezone
+
+import pytest
+
+from shared.app_common import retention
+
+# The parts of the retention job that don't need Postgres: partition naming, picking
+# partitions out of pg_inherits, and the Parquet archive files themselves.
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+def _ts(day: int, hour: int = 0) -> datetime:
+    return datetime(2026, 1, day, hour, tzinfo=timezone.utc)
+
+def _audit(i: int, scenario_id: str, ts: datetime, details=None):
+    return {"audit_id": f"AUD_{i}", "scenario_id": scenario_id, "ts": ts, "service": "orchestrator",
+            "action": "RISK_STATE", "details": details}
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+@pytest.mark.parametrize("d, offset, expected", [
+    (date(2026, 1, 31), 0, date(2026, 1, 1)),
+    (date(2026, 1, 15), 1, date(2026, 2, 1)),
+    (date(2026, 12, 15), 1, date(2027, 1, 1)),
+    (date(2026, 1, 15), -1, date(2025, 12, 1)),
+    (date(2026, 3, 1), -14, date(2025, 1, 1)),
+])
+def test_month_start(d, offset, expected):
+    assert retention._month_start(d, offset) == expected
+
+def test_partition_name():
+    assert retention.partition_name("audit_log", date(2026, 3, 1)) == "audit_log_p202603"
+
+def test_list_partitions_keeps_month_partitions_of_the_table(monkeypatch):
+    children = ["audit_log_p202602", "audit_log_default", "audit_log_p202512",
+                "other_table_p202601", "audit_log_p2026", "audit_log_p202601_old"]
+    monkeypatch.setattr(retention, "fetch_all", lambda query, params: [{"relname": n} for n in children])
+    assert retention.list_partitions("audit_log") == [
+        ("audit_log_p202512", date(2025, 12, 1)),
+        ("audit_log_p202602", date(2026, 2, 1)),
+    ]
+
+def test_write_parquet_uses_the_fixed_schema(archive_dir):
+    # A month where the JSON column is NULL throughout still gets a string column.
+    rows = [_audit(i, "SCN-1", _ts(1, i)) for i in range(3)]
+    n, path = retention._write_parquet("audit_log", "audit_log_p202601", iter([rows[:2], rows[2:]]))
+    assert n == 3
+    assert path == os.path.join(archive_dir, "audit_log", "audit_log_p202601.parquet")
+    table = pq.read_table(path)
+    assert table.schema.equals(retention._schema("audit_log"))
+    assert table.column("details").to_pylist() == [None, None, None]
+    assert not any(name.endswith(".tmp") for name in os.listdir(os.path.dirname(path)))
+
+def test_write_parquet_never_replaces_an_archive(archive_dir):
+    first = [_audit(1, "SCN-1", _ts(1), {"n": 1})]
+    second = [_audit(2, "SCN-1", _ts(2), {"n": 2})]
+    _, path1 = retention._write_parquet("audit_log", "audit_log_p202601", iter([first]))
+    _, path2 = retention._write_parquet("audit_log", "audit_log_p202601", iter([second]))
+    assert path2 == os.path.join(archive_dir, "audit_log", "audit_log_p202601-1.parquet")
+    assert pq.read_table(path1).column("audit_id").to_pylist() == ["AUD_1"]
+    assert pq.read_table(path2).column("audit_id").to_pylist() == ["AUD_2"]
+
+def test_write_parquet_rejects_unknown_columns(archive_dir):
+    rows = [{**_audit(1, "SCN-1", _ts(1)), "added_later": "x"}]
+    with pytest.raises(RuntimeError, match="added_later"):
+        retention._write_parquet("audit_log", "audit_log_p202601", iter([rows]))
+    assert os.listdir(archive_dir / "audit_log") == []
+
+def test_write_parquet_without_rows_writes_nothing(archive_dir):
+    assert retention._write_parquet("audit_log", "audit_log_p202601", iter([])) == (0, None)
+    assert not (archive_dir / "audit_log").exists()
+
+def test_read_archive_round_trip(archive_dir):
+    rows = [
+        _audit(1, "SCN-1", _ts(1), {"balance": 1.5, "pairs": ["USD"]}),
+        _audit(2, "SCN-2", _ts(2)),
+        _audit(3, "SCN-1", _ts(3), {"balance": 2.5}),
+    ]
+    retention._write_parquet("audit_log", "audit_log_p202601", iter([rows[:2]]))
+    retention._write_parquet("audit_log", "audit_log_p202601", iter([rows[2:]]))
+
+    got = sorted(retention.read_archive("audit_log", scenario_id="SCN-1"), key=lambda r: r["ts"])
+    assert [r["audit_id"] for r in got] == ["AUD_1", "AUD_3"]
+    assert got[0]["details"] == {"balance": 1.5, "pairs": ["USD"]}
+    assert got[0]["ts"] == _ts(1)
+
+    got = retention.read_archive("audit_log", start=_ts(2), end=_ts(3))
+    assert [r["audit_id"] for r in got] == ["AUD_2"]
+    assert got[0]["details"] is None
+
+    got = retention.read_archive("audit_log", scenario_id="SCN-1", start=_ts(2))
+    assert [r["audit_id"] for r in got] == ["AUD_3"]
+
+def test_read_archive_of_a_table_never_archived(archive_dir):
+    assert retention.read_archive("audit_log", scenario_id="SCN-1") == []
+
+def test_read_archive_scenario_filter_needs_the_column(archive_dir):
+    rows = [{"exec_id": "EX_1", "rec_id": "REC_1", "ts": _ts(1), "action_type": "SWEEP",
+             "parameters": {"amount": 1.0}, "status": "DONE"}]
+    retention._write_parquet("execution_events", "execution_events_p202601", iter([rows]))
+    with pytest.raises(ValueError, match="execution_events has no scenario_id column"):
+        retention.read_archive("execution_events", scenario_id="SCN-1")
+    assert [r["parameters"] for r in retention.read_archive("execution_events", start=_ts(1))] == [{"amount": 1.0}]
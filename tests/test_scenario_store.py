@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+# scenario_store publishes each scenario version once under SNAPSHOT_DIR and attaches it
+# read-only. These tests run it against a temp directory with the DB lookups stubbed:
+# data_version and the scenario loader are plain functions the tests control.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RISK_ENGINE = os.path.join(ROOT, "services", "risk_engine")
+if RISK_ENGINE not in sys.path:
+    sys.path.insert(0, RISK_ENGINE)
+
+import backtest  # noqa: E402
+import scenario_store  # noqa: E402
+from shared.app_common import refdata  # noqa: E402
+
+REF = {
+    "accounts": [
+        {"account_id": f"A_{c}_{k}", "entity_id": "E1", "currency": c,
+         "account_type": "OPERATING" if k == "OPS" else "FUNDING"}
+        for c in ("EUR", "GBP", "USD") for k in ("FND", "OPS")
+    ],
+    "ew": {("E1", "USD"): 50e6, ("E1", "EUR"): 30e6, ("E1", "GBP"): 20e6},
+    "sweeps": [],
+    "cutoffs": {},
+}
+TS_OPEN = datetime(2026, 1, 5, 7, 0, tzinfo=timezone.utc)
+
+_DB = {}
+
+def _db(scenario_id, seed):
+    # Event ids are random; memoize so a test can compare against what was "in the DB".
+    if (scenario_id, seed) not in _DB:
+        _DB[scenario_id, seed] = backtest.synthesize_scenario(scenario_id, seed, TS_OPEN, REF)
+    return _DB[scenario_id, seed]
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # state["version"] is the scenario's data_version, state["seed"] what the "DB" holds;
+    # loads counts the scenario_id of every load from the DB.
+    state = {"version": "DV-1", "seed": 1, "ew": dict(REF["ew"])}
+    loads = []
+
+    def load_scenario(scenario_id, ref):
+        loads.append(scenario_id)
+        return _db(scenario_id, state["seed"])
+
+    monkeypatch.setattr(scenario_store, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(scenario_store, "_attached", {})
+    monkeypatch.setattr(scenario_store, "data_version", lambda scenario_id: state["version"])
+    monkeypatch.setattr(backtest, "load_scenario", load_scenario)
+    monkeypatch.setattr(backtest, "load_reference_data", lambda: REF)
+    monkeypatch.setattr(refdata, "early_warning_buffers", lambda: state["ew"])
+    return state, loads, tmp_path
+
+def _assert_same(sc, expected):
+    assert sc["pairs"] == expected["pairs"]
+    assert sc["origin"] == expected["origin"]
+    np.testing.assert_array_equal(sc["opening"], expected["opening"])
+    assert sc["events"].keys() == expected["events"].keys()
+    for name, col in expected["events"].items():
+        np.testing.assert_array_equal(sc["events"][name], col)
+
+def _versions(tmp_path, scenario_id):
+    prefix = f"{scenario_store._slug(scenario_id)}@"
+    return sorted(d[len(prefix):] for d in os.listdir(tmp_path) if d.startswith(prefix))
+
+def test_publish_then_attach(store):
+    state, loads, tmp_path = store
+    sc = scenario_store.get_scenario("SCN-A")
+    _assert_same(sc, _db("SCN-A", 1))
+    assert isinstance(sc["events"]["amount"], np.memmap)
+    assert _versions(tmp_path, "SCN-A") == ["DV-1"]
+
+    scenario_store.get_scenario("SCN-A")
+    assert loads == ["SCN-A"]
+
+    # Another worker (empty in-process cache) attaches the published files without a load.
+    scenario_store._attached.clear()
+    _assert_same(scenario_store.get_scenario("SCN-A"), sc)
+    assert loads == ["SCN-A"]
+
+def test_new_version_replaces_the_old_one(store):
+    state, loads, tmp_path = store
+    old = scenario_store.get_scenario("SCN-B")
+    state["version"], state["seed"] = "DV-2", 2
+    new = scenario_store.get_scenario("SCN-B")
+
+    assert loads == ["SCN-B", "SCN-B"]
+    _assert_same(new, _db("SCN-B", 2))
+    assert not np.array_equal(new["events"]["amount"], old["events"]["amount"])
+    assert _versions(tmp_path, "SCN-B") == ["DV-2"]
+    assert list(scenario_store._attached) == [("SCN-B", "DV-2")]
+
+def test_publish_removes_leftover_temp_dirs(store):
+    state, loads, tmp_path = store
+    stale = tmp_path / f"{scenario_store._tmp_prefix('SCN-C')}crashed"
+    stale.mkdir()
+    (stale / "amount.npy").write_bytes(b"partial")
+    other = tmp_path / f"{scenario_store._tmp_prefix('SCN-OTHER')}loading"
+    other.mkdir()
+
+    scenario_store.get_scenario("SCN-C")
+    assert not stale.exists()
+    assert other.exists()
+
+def test_limits_follow_refdata_not_the_snapshot(store):
+    state, loads, tmp_path = store
+    sc = scenario_store.get_scenario("SCN-D")
+    np.testing.assert_array_equal(sc["ew"], [REF["ew"][p] for p in sc["pairs"]])
+
+    state["ew"] = {p: v / 2 for p, v in REF["ew"].items()}
+    again = scenario_store.get_scenario("SCN-D")
+    np.testing.assert_array_equal(again["ew"], [REF["ew"][p] / 2 for p in sc["pairs"]])
+    assert loads == ["SCN-D"]
+
+def test_concurrent_readers_share_one_load(store):
+    state, loads, tmp_path = store
+    errors, barrier = [], threading.Barrier(8)
+
+    def reader():
+        try:
+            barrier.wait()
+            for _ in range(20):
+                scenario_store.get_scenario("SCN-E")
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert loads == ["SCN-E"]
+    assert list(scenario_store._attached) == [("SCN-E", "DV-1")]
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from shared.app_common.singleflight import SingleFlight
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight("test", reuse_s=0)
+    n = 6
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    def caller():
+        try:
+            results.append(flight.do("k", compute))
+        except RuntimeError as e:
+            results.append(e)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=caller) for _ in range(n - 1)]
+    for t in followers:
+        t.start()
+    # Hold the leader until every follower has joined the in-flight call.
+    while flight.stats()["coalesced"] < n - 1:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == n
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len({id(r) for r in results}) == 1
+    stats = flight.stats()
+    assert (stats["calls"], stats["computations"], stats["coalesced"]) == (n, 1, n - 1)
+
+    # Errors are not cached: the next call computes again.
+    release.set()
+    with pytest.raises(RuntimeError):
+        flight.do("k", compute)
+    assert len(calls) == 2
@@ -0,0 +1,44 @@
+import json
+
+from shared.app_common.snapshots import _snapshot_params, pack_forecast, snapshot_hash, to_json, unpack_forecast
+
+RISK = {
+    "scenario_id": "SCN-1",
+    "entity_id": "E1",
+    "currency": "USD",
+    "as_of": "2026-01-05T09:30:00+00:00",
+    "current_balance": 1250000.5,
+    "minutes_to_breach": None,
+    "breach": True,
+    "forecast": [
+        {"t": "2026-01-05T09:35:00+00:00", "balance": 1200000.0},
+        {"t": "2026-01-05T09:40:00+00:00", "balance": -15.25},
+    ],
+}
+
+def test_forecast_round_trip():
+    blob = pack_forecast(RISK["forecast"])
+    assert isinstance(blob, bytes)
+    assert unpack_forecast(blob) == RISK["forecast"]
+    # psycopg hands BYTEA back as memoryview.
+    assert unpack_forecast(memoryview(blob)) == RISK["forecast"]
+    assert unpack_forecast(pack_forecast([])) == []
+
+def test_hash_ignores_key_order():
+    reordered = dict(reversed(list(RISK.items())))
+    reordered["forecast"] = [dict(reversed(list(p.items()))) for p in RISK["forecast"]]
+    assert snapshot_hash(reordered) == snapshot_hash(RISK)
+
+def test_hash_distinguishes_none_and_booleans():
+    assert to_json({"b": True, "a": None}) == '{"a":null,"b":true}'
+    variants = [{**RISK, "minutes_to_breach": v} for v in (None, 0, False, "None")]
+    assert len({snapshot_hash(r) for r in variants}) == len(variants)
+    assert snapshot_hash({**RISK, "breach": True}) != snapshot_hash({**RISK, "breach": 1})
+
+def test_snapshot_row_rebuilds_risk():
+    params = _snapshot_params(RISK)
+    assert params["h"] == snapshot_hash(RISK)
+    # What aload_risk_snapshot does with the stored row.
+    rebuilt = {**json.loads(params["summary"]), "forecast": unpack_forecast(params["forecast"])}
+    assert rebuilt == RISK
+    assert snapshot_hash(rebuilt) == params["h"]